@@ -57,7 +57,7 @@ def create_and_upload_meditation_video(theme='peace and rest', duration=300, ver
     # Step 3: Get music
     logger.info('\n3️⃣  Getting peaceful music...')
     music_mgr = MusicManager()
-    music_file = music_mgr.get_peaceful_music(duration=duration, theme=theme)
+    music_file = music_mgr.get_peaceful_music(duration=duration, theme=theme, aac=True)
 
     if music_file:
         logger.info(f'   ✅ Music: {os.path.basename(music_file)}')
@@ -4,6 +4,8 @@ Analyzes YouTube search patterns and competition
 """
 import os
 import sys
+import json
+import time
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 import requests
@@ -12,9 +14,55 @@ from utils.logging_utils import setup_logger, get_daily_log_file
 
 logger = setup_logger('keyword_research', get_daily_log_file())
 
+# search.list costs 100 quota units, channels.list/playlistItems.list cost 1.
+# The channel map (keyword, lowercased -> channel ID) is built as keywords are
+# searched: the first search records its top result's channel, and later
+# lookups read that channel's uploads instead. Entries can also be added by
+# hand; delete the file to go back to search.list.
+CHANNEL_MAP_FILE = 'data/channel_map.json'
+COMPETITION_CACHE_FILE = 'data/keyword_competition_cache.json'
+COMPETITION_CACHE_TTL = 24 * 3600
+
 class KeywordResearch:
     def __init__(self):
         self.yt_api = YouTubeAPI()
+        self.channel_map = self._load_json(CHANNEL_MAP_FILE)
+        self.competition_cache = self._load_json(COMPETITION_CACHE_FILE)
+        self._cache_dirty = False
+        self._channel_map_dirty = False
+    
+    def _load_json(self, path):
+        """Load a JSON dict from disk, empty dict if missing or corrupt"""
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f'Could not load {path}: {e}')
+            return {}
+    
+    def _save_json(self, path, data):
+        """Write a JSON dict to disk, logging (not raising) on failure"""
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(data, f, indent=2)
+        except OSError as e:
+            logger.warning(f'Could not save {path}: {e}')
+    
+    def _save_competition_cache(self):
+        """Persist competition cache (expired entries dropped) so repeat lookups cost zero quota"""
+        now = time.time()
+        self.competition_cache = {
+            keyword: entry for keyword, entry in self.competition_cache.items()
+            if now - entry.get('cached_at', 0) < COMPETITION_CACHE_TTL
+        }
+        self._save_json(COMPETITION_CACHE_FILE, self.competition_cache)
+        self._cache_dirty = False
+        if self._channel_map_dirty:
+            self._save_json(CHANNEL_MAP_FILE, self.channel_map)
+            self._channel_map_dirty = False
         
     def get_youtube_autocomplete(self, query):
         """Get YouTube autocomplete suggestions"""
@@ -32,7 +80,6 @@ class KeywordResearch:
                 data = response.text
                 # Remove callback wrapper
                 data = data[data.index('(')+1:data.rindex(')')]
-                import json
                 suggestions = json.loads(data)[1]
                 return [s[0] for s in suggestions]
             return []
@@ -40,20 +87,97 @@ class KeywordResearch:
             logger.error(f'Autocomplete error: {e}')
             return []
     
+    def _get_top_video_stats(self, videos):
+        """Fetch stats for (video_id, title) pairs in one videos.list call"""
+        if not videos:
+            return []
+        
+        top_videos = []
+        try:
+            stats = self.yt_api.get_video_stats(','.join(video_id for video_id, _ in videos))
+            stats_by_id = {item['id']: item['statistics'] for item in stats.get('items', [])}
+        except Exception as e:
+            logger.warning(f'Video stats error: {e}')
+            return []
+        
+        for video_id, title in videos:
+            video_stats = stats_by_id.get(video_id)
+            if video_stats:
+                top_videos.append({
+                    'title': title,
+                    'views': int(video_stats.get('viewCount', 0)),
+                    'likes': int(video_stats.get('likeCount', 0))
+                })
+        return top_videos
+    
+    def _search_videos(self, keyword):
+        """Get (video_id, title) pairs for a keyword, preferring cheap endpoints"""
+        channel_id = self.channel_map.get(keyword.lower())
+        
+        if channel_id:
+            # Known channel: channels.list + playlistItems.list (2 units total)
+            channel = self.yt_api.get_channel_stats(channel_id)
+            if channel.get('items'):
+                uploads = channel['items'][0]['contentDetails']['relatedPlaylists']['uploads']
+                results = self.yt_api.get_playlist_items(uploads, max_results=5)
+                return [
+                    (item['contentDetails']['videoId'], item['snippet']['title'])
+                    for item in results.get('items', [])
+                ]
+        
+        # Fall back to search.list (100 units), only fetching what we use
+        results = self.yt_api.search(keyword, max_results=5)
+        if 'items' not in results:
+            return None
+        if results['items'] and results['items'][0]['snippet'].get('channelId'):
+            # Next time this keyword goes through the cheap route
+            self.channel_map[keyword.lower()] = results['items'][0]['snippet']['channelId']
+            self._channel_map_dirty = True
+        return [
+            (item['id'].get('videoId'), item['snippet']['title'])
+            for item in results['items']
+        ]
+    
     def analyze_competition(self, keyword):
         """Analyze competition for a keyword"""
+        return self.analyze_competitions([keyword])[0]
+    
+    def analyze_competitions(self, keywords):
+        """
+        Analyze competition for several keywords
+        
+        The competition cache and channel map are written once for the
+        whole batch, and only if a keyword needed the API.
+        
+        Args:
+            keywords: Keywords to analyze
+        
+        Returns:
+            list: One analysis dict per keyword, in input order
+        """
+        results = [self._analyze_competition(keyword) for keyword in keywords]
+        if self._cache_dirty or self._channel_map_dirty:
+            self._save_competition_cache()
+        return results
+    
+    def _analyze_competition(self, keyword):
+        """Analyze one keyword, updating the in-memory caches"""
+        cached = self.competition_cache.get(keyword)
+        if cached and time.time() - cached.get('cached_at', 0) < COMPETITION_CACHE_TTL:
+            logger.info(f'Using cached competition data for: {keyword}')
+            return cached['result']
+        
         try:
-            # Search YouTube for this keyword
-            results = self.yt_api.search(keyword, max_results=10)
+            videos = self._search_videos(keyword)
             
-            if 'items' not in results:
+            if videos is None:
                 return {
                     'keyword': keyword,
                     'video_count': 0,
                     'competition': 'unknown'
                 }
             
-            video_count = len(results['items'])
+            video_count = len(videos)
             
             # Estimate competition level
             if video_count < 5:
@@ -64,28 +188,21 @@ class KeywordResearch:
                 competition = 'high'
             
             # Get top video stats
-            top_videos = []
-            for item in results['items'][:5]:
-                video_id = item['id'].get('videoId')
-                if video_id:
-                    try:
-                        stats = self.yt_api.get_video_stats(video_id)
-                        if stats.get('items'):
-                            video_stats = stats['items'][0]['statistics']
-                            top_videos.append({
-                                'title': item['snippet']['title'],
-                                'views': int(video_stats.get('viewCount', 0)),
-                                'likes': int(video_stats.get('likeCount', 0))
-                            })
-                    except:
-                        continue
+            top_videos = self._get_top_video_stats(
+                [(video_id, title) for video_id, title in videos[:5] if video_id]
+            )
             
-            return {
+            result = {
                 'keyword': keyword,
                 'video_count': video_count,
                 'competition': competition,
                 'top_videos': top_videos
             }
+            
+            self.competition_cache[keyword] = {'cached_at': time.time(), 'result': result}
+            self._cache_dirty = True
+            
+            return result
         except Exception as e:
             logger.error(f'Competition analysis error for {keyword}: {e}')
             return {
@@ -102,14 +219,10 @@ class KeywordResearch:
         # Get autocomplete variations
         suggestions = self.get_youtube_autocomplete(base_keyword)
         
-        # Analyze base keyword
-        base_analysis = self.analyze_competition(base_keyword)
-        
-        # Analyze top 3 suggestions
-        suggestion_analysis = []
-        for suggestion in suggestions[:3]:
-            analysis = self.analyze_competition(suggestion)
-            suggestion_analysis.append(analysis)
+        # Analyze base keyword and top 3 suggestions (one cache write)
+        base_analysis, *suggestion_analysis = self.analyze_competitions(
+            [base_keyword] + suggestions[:3]
+        )
         
         return {
             'base_keyword': base_keyword,
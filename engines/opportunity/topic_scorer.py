@@ -5,7 +5,9 @@ Combines trend data + keyword research to score and select best topic
 import os
 import sys
 import json
+import time
 from datetime import datetime
+import numpy as np
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from engines.opportunity.trend_monitor import TrendMonitor
@@ -14,6 +16,49 @@ from utils.logging_utils import setup_logger, get_daily_log_file
 
 logger = setup_logger('topic_scorer', get_daily_log_file())
 
+# Rotating fallback topics - Personal Finance + AI blend
+_FALLBACK_TOPICS = (
+    'ChatGPT for budgeting tutorial',
+    'AI tools for tracking expenses',
+    'ChatGPT prompts for saving money',
+    'Using AI to analyze bank statements',
+    'ChatGPT for debt payoff planning',
+    'AI-powered investment research',
+    'ChatGPT for retirement planning',
+    'Automate finances with ChatGPT',
+    'AI tools for credit score improvement',
+    'ChatGPT for side hustle ideas',
+    'Using AI to negotiate bills',
+    'ChatGPT for tax optimization',
+    'AI personal finance assistant setup',
+    'ChatGPT prompts for wealth building',
+    'AI tools for passive income ideas',
+    'ChatGPT for emergency fund planning',
+    'Using AI to find better insurance rates',
+    'ChatGPT for college savings planning',
+    'AI-powered budget forecasting',
+    'ChatGPT for financial goal setting',
+    'AI tools for expense categorization',
+    'ChatGPT for investment portfolio review',
+    'Using AI to reduce monthly bills',
+    'ChatGPT prompts for frugal living',
+    'AI tools for subscription management',
+    'ChatGPT for meal planning on a budget',
+    'Using AI to maximize credit card rewards',
+    'ChatGPT for real estate investing research',
+    'AI-powered net worth tracking',
+    'ChatGPT for financial literacy education',
+)
+
+OPPORTUNITY_FILE = 'data/daily_opportunity.json'
+OPPORTUNITY_TTL_HOURS = 6        # Serve today's result without API calls
+OPPORTUNITY_STALE_MAX_HOURS = 48 # Reuse an older result if all sources fail
+
+# Competition level -> index into _COMPETITION_POINTS (3 = any other value)
+_COMPETITION_INDEX = {'low': 0, 'medium': 1, 'high': 2}
+_COMPETITION_POINTS = np.array([25, 15, 5, 10], dtype=np.float32)
+_RECENCY_POINTS = 15
+
 class TopicScorer:
     def __init__(self):
         self.trend_monitor = TrendMonitor()
@@ -21,67 +66,99 @@ class TopicScorer:
         
     def score_opportunity(self, keyword, trend_data=None, keyword_data=None):
         """Score a single opportunity (0-100)"""
-        score = 0
-        factors = {}
-        
-        # Factor 1: Trend Velocity (0-30 points)
-        if trend_data and 'velocity_pct' in trend_data:
-            velocity = trend_data['velocity_pct']
-            if velocity > 100:
-                trend_score = 30
-            elif velocity > 50:
-                trend_score = 20
-            elif velocity > 0:
-                trend_score = 10
-            else:
-                trend_score = 5
-            score += trend_score
-            factors['trend_velocity'] = trend_score
-        
-        # Factor 2: Search Interest (0-25 points)
-        if trend_data and 'current_interest' in trend_data:
-            interest = trend_data['current_interest']
-            if interest > 75:
-                interest_score = 25
-            elif interest > 50:
-                interest_score = 20
-            elif interest > 25:
-                interest_score = 15
-            else:
-                interest_score = 10
-            score += interest_score
-            factors['search_interest'] = interest_score
-        
-        # Factor 3: Competition Level (0-25 points) - Lower competition = higher score
-        if keyword_data and 'competition' in keyword_data:
-            comp = keyword_data['competition']
-            if comp == 'low':
-                comp_score = 25
-            elif comp == 'medium':
-                comp_score = 15
-            elif comp == 'high':
-                comp_score = 5
-            else:
-                comp_score = 10
-            score += comp_score
-            factors['competition'] = comp_score
-        
-        # Factor 4: Recency Bonus (0-20 points)
-        # New topics get bonus points
-        recency_score = 15  # Default for recent topics
-        score += recency_score
-        factors['recency'] = recency_score
-        
+        result = self.score_opportunities(
+            [{'keyword': keyword, 'source': None, 'trend_data': trend_data}],
+            [keyword_data]
+        )[0]
         return {
             'keyword': keyword,
-            'total_score': score,
-            'factors': factors
+            'total_score': result['total_score'],
+            'factors': result['factors']
         }
     
+    def score_opportunities(self, keywords, keyword_datas):
+        """
+        Score many opportunities at once (0-100 each), best first
+        
+        Factors: trend velocity (0-30), search interest (0-25),
+        competition (0-25, lower competition scores higher) and a flat
+        recency bonus. A factor whose input is missing adds no points.
+        """
+        n = len(keywords)
+        if n == 0:
+            return []
+        
+        # Missing inputs are NaN / -1 so they contribute no points
+        vel = np.full(n, np.nan)
+        intr = np.full(n, np.nan)
+        comp_ix = np.full(n, -1, dtype=np.int8)
+        for i, (kw, keyword_data) in enumerate(zip(keywords, keyword_datas)):
+            trend_data = kw.get('trend_data') or {}
+            if 'velocity_pct' in trend_data:
+                vel[i] = trend_data['velocity_pct']
+            if 'current_interest' in trend_data:
+                intr[i] = trend_data['current_interest']
+            if keyword_data and 'competition' in keyword_data:
+                comp_ix[i] = _COMPETITION_INDEX.get(keyword_data['competition'], 3)
+        
+        has_vel = ~np.isnan(vel)
+        has_intr = ~np.isnan(intr)
+        has_comp = comp_ix >= 0
+        
+        # Comparisons against NaN are False, so masked rows fall to default
+        trend_score = np.select([vel > 100, vel > 50, vel > 0], [30, 20, 10], default=5)
+        interest_score = np.select([intr > 75, intr > 50, intr > 25], [25, 20, 15], default=10)
+        comp_score = _COMPETITION_POINTS[np.where(has_comp, comp_ix, 3)]
+        
+        totals = (
+            np.where(has_vel, trend_score, 0)
+            + np.where(has_intr, interest_score, 0)
+            + np.where(has_comp, comp_score, 0)
+            + _RECENCY_POINTS
+        )
+        
+        results = []
+        for i, kw in enumerate(keywords):
+            factors = {}
+            if has_vel[i]:
+                factors['trend_velocity'] = int(trend_score[i])
+            if has_intr[i]:
+                factors['search_interest'] = int(interest_score[i])
+            if has_comp[i]:
+                factors['competition'] = int(comp_score[i])
+            factors['recency'] = _RECENCY_POINTS
+            
+            results.append({
+                'keyword': kw['keyword'],
+                'total_score': int(totals[i]),
+                'factors': factors,
+                'source': kw['source'],
+                'keyword_data': keyword_datas[i]
+            })
+        
+        # Stable descending order, ties keep discovery order
+        order = np.argsort(-totals, kind='stable')
+        return [results[i] for i in order]
+    
+    def _load_cached_opportunity(self):
+        """Return (result, age_hours) for the saved opportunity, or (None, None)"""
+        try:
+            age_hours = (time.time() - os.stat(OPPORTUNITY_FILE).st_mtime) / 3600
+            with open(OPPORTUNITY_FILE, 'r') as f:
+                return json.load(f), age_hours
+        except (OSError, ValueError):
+            return None, None
+    
     def find_best_topic(self):
         """Main method: Find the best video topic for today"""
         logger.info('Finding best topic for today...')
         
+        cached, cached_age = self._load_cached_opportunity()
+        if (cached and cached_age < OPPORTUNITY_TTL_HOURS
+                and cached.get('date') == datetime.now().strftime('%Y-%m-%d')):
+            logger.info(f'Serving cached opportunity ({cached_age:.1f}h old)')
+            return cached
+        
         # Step 1: Get trending data
         logger.info('Step 1: Gathering trend data...')
         trends = self.trend_monitor.find_opportunities()
@@ -118,76 +195,34 @@ class TopicScorer:
         
         # Step 3: Research and score each keyword
         logger.info(f'Step 2: Scoring {len(keywords)} opportunities...')
-        scored_topics = []
+        keywords = keywords[:10]  # Limit to top 10 to avoid API quota
         
-        for kw in keywords[:10]:  # Limit to top 10 to avoid API quota
-            keyword = kw['keyword']
-            trend_data = kw.get('trend_data', {})
-            
-            # Get keyword research data
-            try:
-                keyword_data = self.keyword_researcher.analyze_competition(keyword)
-            except:
-                keyword_data = {}
-            
-            # Score this opportunity
-            score_result = self.score_opportunity(keyword, trend_data, keyword_data)
-            score_result['source'] = kw['source']
-            score_result['keyword_data'] = keyword_data
-            
-            scored_topics.append(score_result)
+        # Get keyword research data for the whole batch (one cache write)
+        try:
+            keyword_datas = self.keyword_researcher.analyze_competitions([kw['keyword'] for kw in keywords])
+        except:
+            keyword_datas = [{} for _ in keywords]
         
-        # Step 4: Sort by score and select best
-        scored_topics.sort(key=lambda x: x['total_score'], reverse=True)
+        # Step 4: Score all opportunities in one pass, sorted best first
+        scored_topics = self.score_opportunities(keywords, keyword_datas)
         
         if scored_topics:
             best_topic = scored_topics[0]
             logger.info(f'Best topic selected: {best_topic["keyword"]} (score: {best_topic["total_score"]})')
+        elif (cached and cached_age < OPPORTUNITY_STALE_MAX_HOURS
+                and cached.get('best_topic', {}).get('source') != 'fallback_rotating'):
+            # Stale-if-error: a recent real result beats the hard-coded rotation
+            logger.warning(f'No topics found, serving stale opportunity ({cached_age:.1f}h old)')
+            return cached
         else:
             # Fallback to a default finance + AI topic
             logger.warning('No topics found, using rotating fallback')
             
-            # Rotating fallback topics - Personal Finance + AI blend
-            fallback_topics = [
-                'ChatGPT for budgeting tutorial',
-                'AI tools for tracking expenses',
-                'ChatGPT prompts for saving money',
-                'Using AI to analyze bank statements',
-                'ChatGPT for debt payoff planning',
-                'AI-powered investment research',
-                'ChatGPT for retirement planning',
-                'Automate finances with ChatGPT',
-                'AI tools for credit score improvement',
-                'ChatGPT for side hustle ideas',
-                'Using AI to negotiate bills',
-                'ChatGPT for tax optimization',
-                'AI personal finance assistant setup',
-                'ChatGPT prompts for wealth building',
-                'AI tools for passive income ideas',
-                'ChatGPT for emergency fund planning',
-                'Using AI to find better insurance rates',
-                'ChatGPT for college savings planning',
-                'AI-powered budget forecasting',
-                'ChatGPT for financial goal setting',
-                'AI tools for expense categorization',
-                'ChatGPT for investment portfolio review',
-                'Using AI to reduce monthly bills',
-                'ChatGPT prompts for frugal living',
-                'AI tools for subscription management',
-                'ChatGPT for meal planning on a budget',
-                'Using AI to maximize credit card rewards',
-                'ChatGPT for real estate investing research',
-                'AI-powered net worth tracking',
-                'ChatGPT for financial literacy education'
-            ]
-            
             # Use day of year to rotate through topics
-            from datetime import datetime as dt
-            day_of_year = dt.now().timetuple().tm_yday
-            topic_index = day_of_year % len(fallback_topics)
-            selected_topic = fallback_topics[topic_index]
+            topic_index = time.localtime().tm_yday % len(_FALLBACK_TOPICS)
+            selected_topic = _FALLBACK_TOPICS[topic_index]
             
-            logger.info(f'Using fallback topic {topic_index + 1}/{len(fallback_topics)}: {selected_topic}')
+            logger.info(f'Using fallback topic {topic_index + 1}/{len(_FALLBACK_TOPICS)}: {selected_topic}')
             
             best_topic = {
                 'keyword': selected_topic,
@@ -205,7 +240,7 @@ class TopicScorer:
         }
         
         # Save to data directory
-        output_file = 'data/daily_opportunity.json'
+        output_file = OPPORTUNITY_FILE
         with open(output_file, 'w') as f:
             json.dump(result, f, indent=2)
         
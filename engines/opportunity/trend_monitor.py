@@ -4,9 +4,11 @@ Scrapes Google Trends, Product Hunt, Reddit for trending Personal Finance + AI t
 """
 import os
 import sys
+import json
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from pytrends.request import TrendReq
+import numpy as np
 import praw
 import feedparser
 import requests
@@ -25,35 +27,58 @@ class TrendMonitor:
             user_agent='SmartMoneyAutomation/1.0'
         )
         
+    def _interest_over_time_array(self):
+        """Fetch interest over time as a (T, K) float32 array in kw_list order
+        
+        Reads pytrends' raw timeline JSON directly instead of going through
+        interest_over_time(), which builds a pandas DataFrame we only reduce.
+        """
+        widget = self.pytrends.interest_over_time_widget
+        payload = {
+            'req': json.dumps(widget['request']),
+            'token': widget['token'],
+            'tz': self.pytrends.tz
+        }
+        req_json = self.pytrends._get_data(
+            url=TrendReq.INTEREST_OVER_TIME_URL,
+            method=TrendReq.GET_METHOD,
+            trim_chars=5,
+            params=payload,
+        )
+        timeline = req_json['default']['timelineData']
+        if not timeline:
+            return np.empty((0, len(self.pytrends.kw_list)), dtype=np.float32)
+        return np.array([point['value'] for point in timeline], dtype=np.float32)
+    
     def get_google_trends(self, keywords):
         """Get Google Trends data for keywords"""
         try:
             self.pytrends.build_payload(keywords, cat=0, timeframe='now 7-d', geo='US')
-            interest_over_time = self.pytrends.interest_over_time()
+            interest = self._interest_over_time_array()
             
-            if interest_over_time.empty:
+            if interest.size == 0:
                 return []
             
             # Get related queries
             related = self.pytrends.related_queries()
             
+            # Column-wise stats for every keyword at once
+            avg_interest = interest.mean(axis=0)
+            latest_interest = interest[-1]
+            week_ago = interest[0]
+            
+            # Calculate trend velocity
+            velocity = (latest_interest - week_ago) / np.maximum(week_ago, 1) * 100
+            
             trends = []
-            for keyword in keywords:
-                if keyword in interest_over_time.columns:
-                    avg_interest = interest_over_time[keyword].mean()
-                    latest_interest = interest_over_time[keyword].iloc[-1]
-                    
-                    # Calculate trend velocity
-                    week_ago = interest_over_time[keyword].iloc[0] if len(interest_over_time) > 0 else 1
-                    velocity = ((latest_interest - week_ago) / max(week_ago, 1)) * 100
-                    
-                    trends.append({
-                        'keyword': keyword,
-                        'avg_interest': float(avg_interest),
-                        'current_interest': float(latest_interest),
-                        'velocity_pct': float(velocity),
-                        'related_queries': related.get(keyword, {}).get('rising', [])[:5] if related else []
-                    })
+            for idx, keyword in enumerate(keywords):
+                trends.append({
+                    'keyword': keyword,
+                    'avg_interest': float(avg_interest[idx]),
+                    'current_interest': float(latest_interest[idx]),
+                    'velocity_pct': float(velocity[idx]),
+                    'related_queries': related.get(keyword, {}).get('rising', [])[:5] if related else []
+                })
             
             return trends
         except Exception as e:
@@ -4,19 +4,143 @@ Downloads Kevin MacLeod's meditation music from Internet Archive
 License: CC-BY 4.0 (YouTube monetization safe with attribution)
 """
 import os
+import re
 import sys
+import shutil
+import struct
+import zlib
+import asyncio
+import aiohttp
 import requests
 import zipfile
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from utils.logging_utils import setup_logger, get_daily_log_file
+from utils.async_utils import run_sync, write_chunks
 
 logger = setup_logger('incompetech_downloader', get_daily_log_file())
 
+COPY_BUFFER_SIZE = 1024 * 1024  # 1 MiB per read/write
+
+class _ProgressWriter:
+    """File wrapper that logs download progress every `log_every` bytes"""
+
+    def __init__(self, f, total_size, log_every=100 * 1024 * 1024):
+        self.f = f
+        self.total_size = total_size
+        self.log_every = log_every
+        self.written = 0
+        self.next_log = log_every
+
+    def write(self, data):
+        n = self.f.write(data)
+        self.written += len(data)
+        if self.total_size > 0 and self.written >= self.next_log:
+            percent = (self.written / self.total_size) * 100
+            logger.info(f'Download progress: {percent:.1f}%')
+            self.next_log += self.log_every
+        return n
+
+def _stored_member_offset(zip_path, info):
+    """
+    Byte offset of an uncompressed member's data within the archive
+
+    Returns None when the member can't be copied verbatim (compressed or
+    encrypted), in which case it has to go through ZipFile.open.
+    """
+    if info.compress_type != zipfile.ZIP_STORED or info.flag_bits & 0x1:
+        return None
+    with open(zip_path, 'rb') as f:
+        f.seek(info.header_offset)
+        header = f.read(30)
+    if len(header) < 30 or header[:4] != b'PK\x03\x04':
+        return None
+    name_length, extra_length = struct.unpack('<HH', header[26:30])
+    return info.header_offset + 30 + name_length + extra_length
+
+def _copy_range(src_path, offset, size, dst):
+    """Copy size bytes at offset from src_path into dst with copy_file_range"""
+    with open(src_path, 'rb') as src:
+        remaining = size
+        while remaining > 0:
+            copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining, offset)
+            if copied == 0:
+                raise OSError(f'Archive truncated at offset {offset}')
+            offset += copied
+            remaining -= copied
+
+def _range_crc32(path, offset, size):
+    """CRC-32 of size bytes at offset in path, read in COPY_BUFFER_SIZE blocks"""
+    crc = 0
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        remaining = size
+        while remaining > 0:
+            block = f.read(min(remaining, COPY_BUFFER_SIZE))
+            if not block:
+                break
+            crc = zlib.crc32(block, crc)
+            remaining -= len(block)
+    return crc
+
+def _extract_member(zip_path, member_name, output_path):
+    """
+    Extract one zip member straight to output_path
+
+    MP3s are normally stored uncompressed, so on Linux those are copied with
+    copy_file_range and never pass through user space; their CRC-32 is then
+    checked against the archive (a read of the just-copied, page-cached
+    range). Anything else, and any copy that fails the check, goes through
+    its own ZipFile (ZipFile objects are not thread-safe), which verifies
+    the CRC itself; zlib releases the GIL while inflating, so members
+    extract in parallel either way.
+    """
+    partial_path = output_path + '.part'
+    try:
+        with zipfile.ZipFile(zip_path, 'r') as zip_file:
+            info = zip_file.getinfo(member_name)
+            offset = _stored_member_offset(zip_path, info) if hasattr(os, 'copy_file_range') else None
+
+            with open(partial_path, 'wb') as dst:
+                if offset is not None:
+                    try:
+                        _copy_range(zip_path, offset, info.file_size, dst)
+                        if _range_crc32(zip_path, offset, info.file_size) != info.CRC:
+                            # Fall back, so a corrupt member raises BadZipFile
+                            # from ZipFile like any other
+                            logger.warning(f'CRC mismatch on fast copy of {member_name}, re-extracting')
+                            offset = None
+                    except OSError:
+                        # e.g. filesystem without copy_file_range support, or
+                        # an archive shorter than its directory says
+                        offset = None
+                    if offset is None:
+                        dst.seek(0)
+                        dst.truncate()
+                if offset is None:
+                    with zip_file.open(info) as src:
+                        shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+        os.replace(partial_path, output_path)
+    except Exception:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    return output_path
+
 class IncompetechMusicDownloader:
+    # Meditation/ambient/calming keywords, matched in one pass over the filename
+    _KEYWORD_RE = re.compile(
+        r'meditation|calm|peaceful|ambient|serene|tranquil|zen|relax|'
+        r'soothing|gentle|soft|quiet|rest|peace|still',
+        re.IGNORECASE
+    )
+
     def __init__(self):
         self.archive_url = 'https://archive.org/download/incompetech-all-the-music-2020'
         self.cache_dir = 'output/cache/music'
@@ -24,10 +148,62 @@ class IncompetechMusicDownloader:
         os.makedirs(self.cache_dir, exist_ok=True)
         os.makedirs(self.temp_dir, exist_ok=True)
 
+        # Pooled keep-alive connections with retry on transient server errors
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=8,
+            pool_maxsize=8,
+            max_retries=Retry(total=3, backoff_factor=1, status_forcelist=[502, 503, 504])
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _download_archive(self, zip_filename):
+        """Download one archive to temp_dir, returning its path or None on failure"""
+        zip_url = f'{self.archive_url}/{zip_filename}'
+        local_zip = os.path.join(self.temp_dir, zip_filename)
+
+        # Check if already downloaded
+        if os.path.exists(local_zip):
+            logger.info(f'Using cached archive: {zip_filename}')
+            return local_zip
+
+        logger.info(f'Downloading: {zip_filename} (~1.5GB, may take 5-10 minutes)')
+
+        try:
+            response = self.session.get(zip_url, stream=True, timeout=300)
+            response.raise_for_status()
+            response.raw.decode_content = True
+
+            total_size = int(response.headers.get('content-length', 0))
+
+            # Write to a .part file so an interrupted download is never
+            # mistaken for a cached archive on the next run
+            partial_zip = local_zip + '.part'
+            with open(partial_zip, 'wb') as f:
+                shutil.copyfileobj(response.raw, _ProgressWriter(f, total_size), COPY_BUFFER_SIZE)
+            os.replace(partial_zip, local_zip)
+
+            logger.info(f'✅ Downloaded: {zip_filename}')
+            return local_zip
+
+        except Exception as e:
+            logger.error(f'Failed to download {zip_filename}: {e}')
+            return None
+
+    def _extract_archive(self, local_zip):
+        """Extract meditation tracks from a downloaded archive"""
+        logger.info(f'Extracting meditation tracks from {os.path.basename(local_zip)}...')
+        return self._extract_meditation_tracks(local_zip)
+
     def download_meditation_collection(self):
         """
         Download meditation/ambient music from Internet Archive
         Kevin MacLeod's Incompetech collection (CC-BY 4.0)
+
+        Archives download concurrently, and each one is handed to the
+        extractor as soon as it lands, so extraction of one archive
+        overlaps the download of the next.
         """
         logger.info('Downloading meditation music from Internet Archive...')
         logger.info('Source: Kevin MacLeod - Incompetech (CC-BY 4.0)')
@@ -41,44 +217,19 @@ class IncompetechMusicDownloader:
 
         downloaded_tracks = []
 
-        for zip_filename in target_files:
-            zip_url = f'{self.archive_url}/{zip_filename}'
-            local_zip = os.path.join(self.temp_dir, zip_filename)
-
-            # Check if already downloaded
-            if os.path.exists(local_zip):
-                logger.info(f'Using cached archive: {zip_filename}')
-            else:
-                logger.info(f'Downloading: {zip_filename} (~1.5GB, may take 5-10 minutes)')
-
-                try:
-                    response = requests.get(zip_url, stream=True, timeout=300)
-                    response.raise_for_status()
-
-                    total_size = int(response.headers.get('content-length', 0))
-                    block_size = 8192
-                    downloaded = 0
-
-                    with open(local_zip, 'wb') as f:
-                        for chunk in response.iter_content(chunk_size=block_size):
-                            if chunk:
-                                f.write(chunk)
-                                downloaded += len(chunk)
-                                if total_size > 0:
-                                    percent = (downloaded / total_size) * 100
-                                    if downloaded % (block_size * 100) == 0:  # Log every 800KB
-                                        logger.info(f'Download progress: {percent:.1f}%')
-
-                    logger.info(f'✅ Downloaded: {zip_filename}')
-
-                except Exception as e:
-                    logger.error(f'Failed to download {zip_filename}: {e}')
-                    continue
-
-            # Extract meditation tracks
-            logger.info(f'Extracting meditation tracks from {zip_filename}...')
-            extracted = self._extract_meditation_tracks(local_zip)
-            downloaded_tracks.extend(extracted)
+        # Extraction is already parallel per archive, so one extractor thread
+        with ThreadPoolExecutor(max_workers=min(4, len(target_files))) as download_pool, \
+                ThreadPoolExecutor(max_workers=1) as extract_pool:
+            downloads = [download_pool.submit(self._download_archive, name) for name in target_files]
+
+            extractions = []
+            for future in as_completed(downloads):
+                local_zip = future.result()
+                if local_zip:
+                    extractions.append(extract_pool.submit(self._extract_archive, local_zip))
+
+            for future in extractions:
+                downloaded_tracks.extend(future.result())
 
         if downloaded_tracks:
             logger.info(f'✅ Successfully extracted {len(downloaded_tracks)} meditation tracks')
@@ -91,53 +242,108 @@ class IncompetechMusicDownloader:
 
     def _extract_meditation_tracks(self, zip_path):
         """Extract meditation/ambient/calming tracks from zip"""
-        meditation_keywords = [
-            'meditation', 'calm', 'peaceful', 'ambient', 'serene',
-            'tranquil', 'zen', 'relax', 'soothing', 'gentle',
-            'soft', 'quiet', 'rest', 'peace', 'still'
-        ]
-
         extracted_tracks = []
 
         try:
+            # Pick matching members (one per output name) from the central directory
+            targets = {}
             with zipfile.ZipFile(zip_path, 'r') as zip_file:
                 for file_info in zip_file.filelist:
-                    filename = file_info.filename.lower()
-
                     # Check if it's an MP3 file with meditation keywords
-                    if filename.endswith('.mp3'):
-                        if any(keyword in filename for keyword in meditation_keywords):
-                            # Extract to music cache
+                    # (cheap suffix test first, then one regex scan)
+                    if file_info.filename[-4:].lower() == '.mp3':
+                        if self._KEYWORD_RE.search(file_info.filename):
                             output_path = os.path.join(
                                 self.cache_dir,
                                 os.path.basename(file_info.filename)
                             )
+                            targets.setdefault(output_path, file_info.filename)
+
+            pending = []
+            for output_path, member_name in targets.items():
+                # Skip if already extracted
+                if os.path.exists(output_path):
+                    logger.debug(f'Already extracted: {os.path.basename(output_path)}')
+                    extracted_tracks.append(output_path)
+                else:
+                    pending.append((member_name, output_path))
+
+            # Extract directly into the music cache, several members at a time
+            with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as executor:
+                futures = [
+                    executor.submit(_extract_member, zip_path, member_name, output_path)
+                    for member_name, output_path in pending
+                ]
+                for future in futures:
+                    try:
+                        output_path = future.result()
+                        extracted_tracks.append(output_path)
+                        logger.info(f'Extracted: {os.path.basename(output_path)}')
+                    except Exception as e:
+                        logger.error(f'Error extracting track: {e}')
 
-                            # Skip if already extracted
-                            if os.path.exists(output_path):
-                                logger.debug(f'Already extracted: {os.path.basename(file_info.filename)}')
-                                extracted_tracks.append(output_path)
-                                continue
+        except Exception as e:
+            logger.error(f'Error extracting tracks: {e}')
+
+        return extracted_tracks
 
-                            # Extract the file
-                            zip_file.extract(file_info, self.temp_dir)
+    async def _fetch_track(self, session, track_url, output_path):
+        """Stream one track to disk, returning its path or None on failure"""
+        track_name = os.path.basename(output_path)
+        partial_path = output_path + '.part'
+
+        try:
+            logger.info(f'Downloading: {track_name}')
+            async with session.get(track_url, timeout=aiohttp.ClientTimeout(total=60)) as response:
+                response.raise_for_status()
+                await write_chunks(response.content.iter_chunked(COPY_BUFFER_SIZE), partial_path)
+            os.replace(partial_path, output_path)
 
-                            # Move to music cache
-                            temp_path = os.path.join(self.temp_dir, file_info.filename)
-                            if os.path.exists(temp_path):
-                                os.rename(temp_path, output_path)
-                                extracted_tracks.append(output_path)
-                                logger.info(f'Extracted: {os.path.basename(output_path)}')
+            file_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
+            logger.info(f'✅ Downloaded: {track_name} ({file_size:.1f} MB)')
+            return output_path
 
         except Exception as e:
-            logger.error(f'Error extracting tracks: {e}')
+            logger.warning(f'Could not download {track_name}: {e}')
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            return None
 
-        return extracted_tracks
+    async def _track_exists(self, session, track_url):
+        """HEAD a track URL; True when it can be downloaded"""
+        try:
+            async with session.head(
+                track_url, allow_redirects=True, timeout=aiohttp.ClientTimeout(total=10)
+            ) as response:
+                return response.status == 200
+        except Exception as e:
+            logger.debug(f'HEAD failed for {track_url}: {e}')
+            return False
+
+    async def _download_tracks(self, tasks):
+        """
+        Download all (url, output_path) tasks concurrently
+
+        Every URL is checked with a HEAD first, so missing tracks are
+        dropped in one round trip instead of after a full GET.
+        """
+        async with aiohttp.ClientSession() as session:
+            alive = await asyncio.gather(
+                *[self._track_exists(session, url) for url, _ in tasks]
+            )
+            for (url, path), exists in zip(tasks, alive):
+                if not exists:
+                    logger.warning(f'Not available: {os.path.basename(path)}')
+
+            return await asyncio.gather(
+                *[self._fetch_track(session, url, path)
+                  for (url, path), exists in zip(tasks, alive) if exists]
+            )
 
     def download_specific_tracks(self):
         """
         Download specific meditation tracks directly (faster than full archive)
-        Uses Internet Archive's direct file access
+        Uses Internet Archive's direct file access, fetching all tracks concurrently
         """
         logger.info('Downloading specific meditation tracks...')
 
@@ -150,35 +356,26 @@ class IncompetechMusicDownloader:
             'Kevin_MacLeod_-_Relaxing.mp3',
         ]
 
-        downloaded = []
-
+        tasks = []
         for track_name in meditation_tracks:
             output_path = os.path.join(self.cache_dir, track_name)
 
             if os.path.exists(output_path):
                 logger.info(f'Already have: {track_name}')
-                downloaded.append(output_path)
                 continue
 
             # Try to download from archive
-            track_url = f'{self.archive_url}/{track_name}'
+            tasks.append((f'{self.archive_url}/{track_name}', output_path))
 
-            try:
-                logger.info(f'Downloading: {track_name}')
-                response = requests.get(track_url, timeout=60)
-                response.raise_for_status()
-
-                with open(output_path, 'wb') as f:
-                    f.write(response.content)
-
-                file_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
-                logger.info(f'✅ Downloaded: {track_name} ({file_size:.1f} MB)')
-                downloaded.append(output_path)
+        if tasks:
+            run_sync(self._download_tracks(tasks))
 
-            except Exception as e:
-                logger.warning(f'Could not download {track_name}: {e}')
-
-        return downloaded
+        # Keep the configured track order in the result
+        return [
+            os.path.join(self.cache_dir, track_name)
+            for track_name in meditation_tracks
+            if os.path.exists(os.path.join(self.cache_dir, track_name))
+        ]
 
 if __name__ == '__main__':
     from dotenv import load_dotenv
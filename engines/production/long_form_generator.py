@@ -6,16 +6,17 @@ Highly modular and reusable.
 """
 import os
 import sys
+import shutil
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 import asyncio
 from utils.logging_utils import setup_logger, get_daily_log_file
+from utils.ffmpeg_utils import run_ffmpeg
 from engines.content.scripture_curator import ScriptureCurator
 from engines.production.scripture_narrator import ScriptureNarrator
 from engines.production.meditation_video_assembler import MeditationVideoAssembler
 from engines.production.nature_asset_manager import NatureAssetManager
 from engines.production.music_manager import MusicManager
-from engines.content.meditation_seo_generator import MeditationSEOGenerator
 
 logger = setup_logger("long_form_generator", get_daily_log_file())
 
@@ -88,9 +89,8 @@ class LongFormGenerator:
                 nature_themes = ["rain", "ocean waves", "forest", "clouds"]
 
             nature_videos = nature_manager.fetch_nature_videos(
-                query=nature_themes[0],
-                count=1,
-                min_duration=15
+                theme=nature_themes[0],
+                count=1
             )
 
             if not nature_videos:
@@ -102,13 +102,12 @@ class LongFormGenerator:
             # Step 4: Get background music
             logger.info("Step 4/6: Selecting background music...")
             music_manager = MusicManager()
-            music_file = music_manager.get_meditation_music()
+            music_file = music_manager.get_peaceful_music(duration=self.duration_8hr)
 
             logger.info(f"Background music selected: {music_file}")
 
             # Step 5: Generate SEO metadata
             logger.info("Step 5/6: Generating SEO metadata...")
-            seo_generator = MeditationSEOGenerator()
 
             # Create title with BALANCED MATRIX format
             title = f"Bible Verses for {emotion} in Face of {event} | 8 Hour Sleep Meditation"
@@ -166,56 +165,33 @@ http://creativecommons.org/licenses/by/4.0/
             logger.info("Mixing narration with background music...")
             mixed_audio = os.path.join(output_dir, "mixed_audio.mp3")
 
-            import subprocess
             mix_cmd = [
                 "ffmpeg", "-y",
                 "-i", narration_file,
+                "-stream_loop", "-1",  # Loop the music at the demuxer, nothing buffered
                 "-i", music_file,
                 "-filter_complex",
-                f"[0:a]volume=0.7[narration];[1:a]volume=0.3,aloop=loop=-1:size=2e+09[music];[narration][music]amix=inputs=2:duration=first[audio]",
+                f"[0:a]volume=0.7[narration];[1:a]volume=0.3[music];[narration][music]amix=inputs=2:duration=first[audio]",
                 "-map", "[audio]",
                 "-t", str(self.duration_8hr),
                 mixed_audio
             ]
 
-            subprocess.run(mix_cmd, check=True)
+            run_ffmpeg(mix_cmd, duration=self.duration_8hr, logger=logger)
             logger.info("Audio mixing complete")
 
             # Assemble final video with looped background and scripture overlays
             logger.info("Assembling final video with text overlays...")
 
-            # Create scripture overlays for each verse (every 30 seconds)
-            # This will be integrated with existing meditation_video_assembler.py
-            from engines.production.scripture_overlay_generator import ScriptureOverlayGenerator
-
-            overlay_generator = ScriptureOverlayGenerator()
-            overlay_files = []
-
-            for idx, scripture in enumerate(scriptures):
-                overlay_file = os.path.join(output_dir, "overlays", f"overlay_{idx}.png")
-                os.makedirs(os.path.dirname(overlay_file), exist_ok=True)
-
-                overlay_generator.create_scripture_overlay(
-                    verse=scripture["verse"],
-                    reference=scripture["reference"],
-                    output_file=overlay_file
-                )
-
-                overlay_files.append(overlay_file)
-
-                if (idx + 1) % 100 == 0:
-                    logger.info(f"Generated {idx + 1}/{len(scriptures)} text overlays")
-
-            logger.info(f"All {len(overlay_files)} text overlays generated")
-
-            # Final video assembly
-            assembler.assemble_meditation_video(
-                nature_video=nature_videos[0],
-                audio_file=mixed_audio,
-                scriptures=scriptures,
-                duration=self.duration_8hr,
-                output_file=output_video
+            # Final video assembly (the assembler renders the verse text itself
+            # and names its output by timestamp, so move it into output_dir)
+            assembled_video = assembler.assemble_meditation_video(
+                nature_videos,
+                scriptures,
+                mixed_audio,
+                duration=self.duration_8hr
             )
+            shutil.move(assembled_video, output_video)
 
             logger.info(f"8-hour video generation complete: {output_video}")
 
@@ -235,7 +211,7 @@ http://creativecommons.org/licenses/by/4.0/
                     "music": music_file,
                     "nature_video": nature_videos[0],
                     "mixed_audio": mixed_audio,
-                    "overlay_count": len(overlay_files)
+                    "overlay_count": len(scriptures)
                 }
             }
 
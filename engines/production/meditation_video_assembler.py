@@ -3,16 +3,255 @@ Meditation Video Assembler - Creates videos with scripture overlays and peaceful
 Supports multiple resolutions: 1920x1080 (16:9), 1080x1080 (1:1 square)
 """
 import os
+import asyncio
 import subprocess
 import json
+import shutil
+import hashlib
+import tempfile
+import concurrent.futures
+import functools
 from datetime import datetime
 from PIL import Image, ImageDraw, ImageFont
 import textwrap
 
 from utils.logging_utils import setup_logger, get_daily_log_file
+from utils.ffmpeg_utils import run_ffmpeg, run_ffmpeg_async, select_h264_encoder, H264_ENCODER_PROFILES
 
 logger = setup_logger('meditation_assembler', get_daily_log_file())
 
+# (verse font, reference font) candidates, tried in order
+_FONT_CANDIDATES = (
+    ('/usr/share/fonts/truetype/dejavu/DejaVuSerif.ttf', '/usr/share/fonts/truetype/dejavu/DejaVuSerif-Italic.ttf'),
+    ('arial.ttf', 'arial.ttf'),
+)
+
+# Rendered overlays, keyed by content; bump the version when the layout changes
+OVERLAY_CACHE_DIR = 'output/cache/overlays'
+OVERLAY_CACHE_VERSION = 'v1'
+
+# Nature clips pre-scaled to the output resolution, evicted oldest-first
+BASE_CLIP_CACHE_DIR = 'output/cache/base_videos'
+BASE_CLIP_CACHE_MAX_BYTES = 5 * 1024 ** 3
+
+@functools.lru_cache(maxsize=32)
+def _get_font(path, size):
+    """Load a TrueType font once per (path, size) per process"""
+    return ImageFont.truetype(path, size)
+
+@functools.lru_cache(maxsize=None)
+def _load_fonts(verse_font_size, ref_font_size):
+    """
+    Return (verse_font, ref_font) from the first candidate pair that loads
+
+    Cached per process (each pool worker has its own copy), so missing
+    candidates are only tried once.
+    """
+    for verse_path, ref_path in _FONT_CANDIDATES:
+        try:
+            return _get_font(verse_path, verse_font_size), _get_font(ref_path, ref_font_size)
+        except OSError:
+            continue
+    return ImageFont.load_default(), ImageFont.load_default()
+
+def _font_sizes(width, height):
+    """(verse, reference) font sizes for a given overlay resolution"""
+    scale_factor = min(width / 1920, height / 1080)
+    return int(52 * scale_factor), int(36 * scale_factor)
+
+def _init_fonts(width, height):
+    """ProcessPoolExecutor initializer: load fonts before the first task"""
+    _load_fonts(*_font_sizes(width, height))
+
+def _parse_verse(verse_data):
+    """Split a scripture entry (str or dict) into (verse_text, reference)"""
+    if isinstance(verse_data, str):
+        if ' - ' in verse_data:
+            verse_text, reference = verse_data.rsplit(' - ', 1)
+        else:
+            verse_text = verse_data
+            reference = ''
+    else:
+        # Support both 'verse' and 'text' keys
+        verse_text = verse_data.get('verse', verse_data.get('text', ''))
+        reference = verse_data.get('reference', '')
+    return verse_text, reference
+
+def _text_width(font, text):
+    """Horizontal advance of text, without rasterizing the glyphs"""
+    if hasattr(font, 'getlength'):
+        return int(font.getlength(text))
+    return font.getsize(text)[0]  # Pillow < 9.2
+
+def _overlay_top(height):
+    """Top row of the text band; overlays are placed at y=_overlay_top(height)"""
+    return int(height * 0.37)  # ~400px at 1080p
+
+def _overlay_cache_path(verse_text, reference, width, height):
+    """Content-addressed cache path for an overlay"""
+    key = hashlib.sha256(
+        f'{verse_text}|{reference}|{width}x{height}|{OVERLAY_CACHE_VERSION}'.encode('utf-8')
+    ).hexdigest()
+    return os.path.join(OVERLAY_CACHE_DIR, key[:2], key + '.png')
+
+def _link_overlay(cache_path, output_file):
+    """Hard-link a cached overlay to output_file (copy across filesystems)"""
+    if os.path.exists(output_file):
+        os.remove(output_file)
+    try:
+        os.link(cache_path, output_file)
+    except OSError:
+        shutil.copyfile(cache_path, output_file)
+
+@functools.lru_cache(maxsize=8)
+def _band_template(width, band_height, box_height):
+    """Empty overlay band with the dark box drawn; callers draw on a copy"""
+    img = Image.new('LA', (width, band_height), (0, 0))
+    ImageDraw.Draw(img).rectangle([(0, 0), (width, box_height)], fill=(0, 120))
+    return img
+
+def _render_overlay(task):
+    """
+    Render one scripture overlay PNG, or reuse it from the overlay cache
+
+    Only the text band is rendered (full width, from _overlay_top down to
+    the end of the text), in grayscale+alpha: everything drawn is white,
+    grey or black, so RGB channels would only triple the bytes encoded.
+
+    Module-level so it can be pickled into a ProcessPoolExecutor.
+
+    Args:
+        task: (verse_text, reference, output_file, width, height); with
+            output_file None the overlay is only written to the cache
+
+    Returns:
+        str: Path to the saved overlay (the cache path if output_file is None)
+    """
+    verse_text, reference, output_file, width, height = task
+
+    cache_path = _overlay_cache_path(verse_text, reference, width, height)
+    if not os.path.exists(cache_path):
+        _draw_overlay(verse_text, reference, width, height, cache_path)
+    if output_file is None:
+        return cache_path
+    _link_overlay(cache_path, output_file)
+    return output_file
+
+def _draw_overlay(verse_text, reference, width, height, cache_path):
+    """Draw the overlay band and save it to cache_path"""
+    # Calculate dimensions based on resolution
+    scale_factor = min(width / 1920, height / 1080)
+
+    # Fonts are cached per process, so only the first overlay parses the TTFs
+    verse_font, ref_font = _load_fonts(*_font_sizes(width, height))
+
+    # Clean verse text (remove quotes)
+    clean_verse = verse_text.strip('"').strip("'")
+
+    # Wrap text (proportional to width)
+    wrap_width = int(50 * (width / 1920))
+    wrapped = textwrap.fill(clean_verse, width=wrap_width)
+    lines = wrapped.split('\n')
+
+    # Lay out in frame coordinates, then size the band to fit the text
+    overlay_top = _overlay_top(height)
+    overlay_bottom = int(height * 0.63)  # ~680px at 1080p
+    line_height = int(60 * scale_factor)
+    verse_y = int(height * 0.42)  # ~450px at 1080p
+    ref_y = verse_y + len(lines) * line_height + int(20 * scale_factor)
+    band_bottom = min(height, max(overlay_bottom, ref_y + ref_font.getbbox(reference or ' ')[3]))
+
+    # Transparent band with the semi-transparent dark box for readability
+    img = _band_template(width, band_bottom - overlay_top, overlay_bottom - overlay_top).copy()
+    draw = ImageDraw.Draw(img)
+
+    # Draw verse text (centered) as one block; Pillow lays the lines out
+    # line_height apart (its pitch is the height of "A" plus spacing)
+    spacing = line_height - draw.textbbox((0, 0), 'A', font=verse_font)[3]
+    block_width = max((_text_width(verse_font, line) for line in lines), default=0)
+    x_position = (width - block_width) // 2
+    draw.multiline_text(
+        (x_position, verse_y - overlay_top), wrapped,
+        fill=(255, 255), font=verse_font, spacing=spacing, align='center'
+    )
+
+    # Draw reference (centered below verse)
+    ref_width = _text_width(ref_font, reference)
+    x_position = (width - ref_width) // 2
+    draw.text((x_position, ref_y - overlay_top), reference, fill=(200, 255), font=ref_font)
+
+    # Save (favour encode speed over size); write-then-rename so a concurrent
+    # render of the same verse never sees a half-written PNG
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    part_path = f'{cache_path}.{os.getpid()}.part'
+    img.save(part_path, 'PNG', optimize=False, compress_level=1)
+    os.replace(part_path, cache_path)
+
+@functools.lru_cache(maxsize=None)
+def _ffmpeg_filters():
+    """Names of the filters compiled into the local ffmpeg (probed once)"""
+    try:
+        result = subprocess.run(['ffmpeg', '-hide_banner', '-filters'], capture_output=True, text=True)
+    except OSError:
+        return frozenset()
+    return frozenset(
+        parts[1] for parts in (line.split() for line in result.stdout.splitlines())
+        if len(parts) >= 3 and '->' in parts[2]
+    )
+
+def _select_encoder():
+    """H.264 encoder for meditation videos; MEDITATION_VIDEO_ENCODER forces a profile"""
+    return select_h264_encoder(os.environ.get('MEDITATION_VIDEO_ENCODER'))
+
+def _ffmpeg_threads():
+    """Threads per ffmpeg run: MEDITATION_FFMPEG_THREADS, else half the cores (1-64)"""
+    default = max(1, (os.cpu_count() or 4) // 2)
+    value = os.environ.get('MEDITATION_FFMPEG_THREADS')
+    if not value:
+        return min(default, 64)
+    try:
+        return min(max(int(value), 1), 64)
+    except ValueError:
+        logger.warning(f'Ignoring invalid MEDITATION_FFMPEG_THREADS={value!r}')
+        return min(default, 64)
+
+def _base_clip_cache_path(src, width, height):
+    """Cache path for src scaled to width x height, keyed by its content"""
+    digest = hashlib.sha1()
+    with open(src, 'rb') as f:
+        digest.update(f.read(1 << 20))
+    digest.update(f'{os.path.getsize(src)}|{width}x{height}'.encode('utf-8'))
+    return os.path.join(BASE_CLIP_CACHE_DIR, digest.hexdigest() + '.mp4')
+
+def _evict_base_clips(max_bytes=BASE_CLIP_CACHE_MAX_BYTES):
+    """Delete least recently used cached clips until the cache fits max_bytes"""
+    with os.scandir(BASE_CLIP_CACHE_DIR) as entries:
+        clips = [(entry.stat(), entry.path) for entry in entries
+                 if entry.name.endswith('.mp4') and entry.is_file()]
+    total = sum(stat.st_size for stat, _ in clips)
+    for stat, path in sorted(clips, key=lambda clip: clip[0].st_atime):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= stat.st_size
+        logger.info(f'Evicted cached base clip: {path}')
+
+def _ass_time(seconds):
+    """Format seconds as an ASS timestamp (H:MM:SS.cc)"""
+    centis = int(round(seconds * 100))
+    hours, centis = divmod(centis, 360000)
+    minutes, centis = divmod(centis, 6000)
+    secs, centis = divmod(centis, 100)
+    return f'{hours}:{minutes:02d}:{secs:02d}.{centis:02d}'
+
+def _ass_text(text):
+    """Neutralise characters that ASS treats as override/escape syntax"""
+    return text.replace('\\', '/').replace('{', '(').replace('}', ')')
+
+def _filter_path(path):
+    """Quote a file path for use as an ffmpeg filter option value"""
+    return "'" + path.replace('\\', '/').replace("'", "'\\''") + "'"
+
 class MeditationVideoAssembler:
     def __init__(self):
         self.output_dir = 'output/videos'
@@ -20,6 +259,30 @@ class MeditationVideoAssembler:
         os.makedirs(self.output_dir, exist_ok=True)
         os.makedirs(self.overlay_dir, exist_ok=True)
 
+        # Render verses with libass when available, then drawtext; PNG
+        # overlays only for builds with neither
+        filters = _ffmpeg_filters()
+        self.use_subtitles = 'subtitles' in filters
+        self.use_drawtext = not self.use_subtitles and 'drawtext' in filters
+
+        # Hardware H.264 encoder when one works on this machine, else libx264
+        self.encoder = _select_encoder()
+        self.encoder_profile = H264_ENCODER_PROFILES[self.encoder]
+        if self.encoder != 'libx264':
+            logger.info(f'Using hardware encoder: {self.encoder}')
+
+        # Looped nature footage has little motion, so a fast x264 preset
+        # (with a slightly lower CRF to compensate) encodes several times
+        # faster for nearly the same quality
+        self.x264_preset = os.environ.get('X264_PRESET', 'veryfast')
+        self.codec_args = list(self.encoder_profile['codec_args'])
+        if self.encoder == 'libx264':
+            self.codec_args += ['-preset', self.x264_preset]
+
+        # ffmpeg defaults to one thread per core for each stage; cap it so
+        # several assemblies running side by side don't oversubscribe the CPU
+        self.ffmpeg_threads = _ffmpeg_threads()
+
     def create_scripture_overlay(self, verse_text, reference, index, output_file=None, width=1920, height=1080):
         """
         Create a beautiful scripture overlay image with custom resolution
@@ -35,66 +298,261 @@ class MeditationVideoAssembler:
         if not output_file:
             output_file = os.path.join(self.overlay_dir, f'scripture_{index}.png')
 
-        # Create image with semi-transparent dark background
-        img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
+        _render_overlay((verse_text, reference, output_file, width, height))
+        logger.info(f'Created scripture overlay: {output_file} ({width}x{height})')
+        return output_file
+
+    def render_scripture_overlays(self, scriptures, width=1920, height=1080, overlay_dir=None):
+        """
+        Render overlays for all scriptures in parallel across CPU cores
 
-        # Calculate dimensions based on resolution
-        scale_factor = min(width / 1920, height / 1080)
+        Args:
+            scriptures: List of scripture dicts or "verse - reference" strings
+            width: Overlay width in pixels
+            height: Overlay height in pixels
+            overlay_dir: If given, each overlay is also linked there as
+                scripture_{idx}.png; otherwise the cache paths are returned
 
-        # Add subtle dark overlay for text readability (proportional to height)
-        overlay_top = int(height * 0.37)  # ~400px at 1080p
-        overlay_bottom = int(height * 0.63)  # ~680px at 1080p
-        overlay_box = [(0, overlay_top), (width, overlay_bottom)]
-        draw.rectangle(overlay_box, fill=(0, 0, 0, 120))
+        Returns:
+            list: Overlay paths, in the same order as scriptures
+        """
+        # Overlays are keyed by content, so a verse that recurs (within this
+        # video or from an earlier one) is rendered at most once
+        overlay_files = []
+        pending = {}
+        for verse_data in scriptures:
+            verse_text, reference = _parse_verse(verse_data)
+            cache_path = _overlay_cache_path(verse_text, reference, width, height)
+            overlay_files.append(cache_path)
+            if cache_path not in pending and not os.path.exists(cache_path):
+                pending[cache_path] = (verse_text, reference, None, width, height)
+        tasks = list(pending.values())
+
+        if tasks:
+            # Each overlay is an independent PIL draw + PNG encode, so farm them
+            # out; no more workers than tasks, since each one pays a fork + font load
+            workers = min(os.cpu_count() or 1, len(tasks))
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_fonts, initargs=(width, height)
+            ) as executor:
+                list(executor.map(_render_overlay, tasks, chunksize=16))
+
+        logger.info(
+            f'Created {len(overlay_files)} scripture overlays ({width}x{height}), '
+            f'{len(tasks)} rendered, the rest from cache'
+        )
+
+        if overlay_dir:
+            os.makedirs(overlay_dir, exist_ok=True)
+            linked_files = []
+            for idx, cache_path in enumerate(overlay_files):
+                overlay_file = os.path.join(overlay_dir, f'scripture_{idx}.png')
+                _link_overlay(cache_path, overlay_file)
+                linked_files.append(overlay_file)
+            return linked_files
+
+        return overlay_files
+
+    def write_scripture_subtitles(self, scriptures, windows, output_file, width=1920, height=1080):
+        """
+        Write all verses to one ASS subtitle file, styled like the PNG overlays
 
-        # Calculate font sizes
-        verse_font_size = int(52 * scale_factor)
-        ref_font_size = int(36 * scale_factor)
+        Args:
+            scriptures: List of scripture dicts or "verse - reference" strings
+            windows: List of (start_time, end_time) per verse
+            output_file: Path to save the .ass file
+            width: Video width in pixels
+            height: Video height in pixels
 
-        # Try to load fonts
-        try:
-            verse_font = ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSerif.ttf', verse_font_size)
-            ref_font = ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSerif-Italic.ttf', ref_font_size)
-        except:
-            try:
-                verse_font = ImageFont.truetype('arial.ttf', verse_font_size)
-                ref_font = ImageFont.truetype('arial.ttf', ref_font_size)
-            except:
-                verse_font = ImageFont.load_default()
-                ref_font = ImageFont.load_default()
-
-        # Clean verse text (remove quotes)
-        clean_verse = verse_text.strip('"').strip("'")
-
-        # Wrap text (proportional to width)
+        Returns:
+            str: Path to the subtitle file
+        """
+        scale_factor = min(width / 1920, height / 1080)
+        verse_font_size, ref_font_size = _font_sizes(width, height)
+        line_height = int(60 * scale_factor)
         wrap_width = int(50 * (width / 1920))
-        wrapped = textwrap.fill(clean_verse, width=wrap_width)
-        lines = wrapped.split('\n')
+        box_top = int(height * 0.37)
+        box_bottom = int(height * 0.63)
+        text_top = int(height * 0.42)
+
+        # ASS colours are &HAABBGGRR with AA=00 opaque; the box is 120/255 opaque
+        lines = [
+            '[Script Info]',
+            'ScriptType: v4.00+',
+            f'PlayResX: {width}',
+            f'PlayResY: {height}',
+            'WrapStyle: 2',
+            '',
+            '[V4+ Styles]',
+            'Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, '
+            'Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, '
+            'Shadow, Alignment, MarginL, MarginR, MarginV, Encoding',
+            f'Style: Verse,DejaVu Serif,{verse_font_size},&H00FFFFFF,&H00FFFFFF,&H00000000,&H00000000,'
+            '0,0,0,0,100,100,0,0,1,0,0,8,0,0,0,1',
+            f'Style: Reference,DejaVu Serif,{ref_font_size},&H00C8C8C8,&H00C8C8C8,&H00000000,&H00000000,'
+            '0,1,0,0,100,100,0,0,1,0,0,8,0,0,0,1',
+            '',
+            '[Events]',
+            'Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text',
+        ]
 
-        # Draw verse text (centered)
-        line_height = int(60 * scale_factor)
-        y_position = int(height * 0.42)  # ~450px at 1080p
-
-        for line in lines:
-            bbox = draw.textbbox((0, 0), line, font=verse_font)
-            text_width = bbox[2] - bbox[0]
-            x_position = (width - text_width) // 2
-            draw.text((x_position, y_position), line, fill=(255, 255, 255, 255), font=verse_font)
-            y_position += line_height
-
-        # Draw reference (centered below verse)
-        y_position += int(20 * scale_factor)
-        bbox = draw.textbbox((0, 0), reference, font=ref_font)
-        ref_width = bbox[2] - bbox[0]
-        x_position = (width - ref_width) // 2
-        draw.text((x_position, y_position), reference, fill=(200, 200, 200, 255), font=ref_font)
-
-        # Save
-        img.save(output_file, 'PNG')
-        logger.info(f'Created scripture overlay: {output_file} ({width}x{height})')
+        box = (
+            f'{{\\an7\\pos(0,{box_top})\\p1\\1c&H000000&\\1a&H87&}}'
+            f'm 0 0 l {width} 0 {width} {box_bottom - box_top} 0 {box_bottom - box_top}{{\\p0}}'
+        )
+
+        for verse_data, (start_time, end_time) in zip(scriptures, windows):
+            verse_text, reference = _parse_verse(verse_data)
+            clean_verse = verse_text.strip('"').strip("'")
+            wrapped = textwrap.wrap(clean_verse, width=wrap_width) or ['']
+            start, end = _ass_time(start_time), _ass_time(end_time)
+            ref_top = text_top + len(wrapped) * line_height + int(20 * scale_factor)
+
+            lines.append(f'Dialogue: 0,{start},{end},Verse,,0,0,0,,{box}')
+            lines.append(
+                f'Dialogue: 1,{start},{end},Verse,,0,0,0,,'
+                f'{{\\an8\\pos({width // 2},{text_top})}}' + '\\N'.join(_ass_text(l) for l in wrapped)
+            )
+            if reference:
+                lines.append(
+                    f'Dialogue: 1,{start},{end},Reference,,0,0,0,,'
+                    f'{{\\an8\\pos({width // 2},{ref_top})}}{_ass_text(reference)}'
+                )
+
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        logger.info(f'Created scripture subtitles: {output_file} ({len(windows)} verses)')
         return output_file
 
+    def build_drawtext_filter(self, scriptures, windows, text_dir, width=1920, height=1080):
+        """
+        Build a drawbox + drawtext filter chain that draws every verse
+
+        Each line is written to its own file under text_dir and passed via
+        textfile=, which sidesteps drawtext's multi-level escaping rules.
+
+        Args:
+            scriptures: List of scripture dicts or "verse - reference" strings
+            windows: List of (start_time, end_time) per verse
+            text_dir: Directory for the per-line text files
+            width: Video width in pixels
+            height: Video height in pixels
+
+        Returns:
+            str: Comma-separated filter chain (no input/output labels)
+        """
+        os.makedirs(text_dir, exist_ok=True)
+        scale_factor = min(width / 1920, height / 1080)
+        verse_font_size, ref_font_size = _font_sizes(width, height)
+        line_height = int(60 * scale_factor)
+        wrap_width = int(50 * (width / 1920))
+        box_top = int(height * 0.37)
+        box_height = int(height * 0.63) - box_top
+        text_top = int(height * 0.42)
+
+        verse_path, ref_path = next(
+            ((v, r) for v, r in _FONT_CANDIDATES if os.path.isabs(v) and os.path.exists(v)),
+            (None, None)
+        )
+        verse_font = f':fontfile={_filter_path(verse_path)}' if verse_path else ''
+        ref_font = f':fontfile={_filter_path(ref_path)}' if ref_path else ''
+
+        # The windows are back to back, so one box covers all of them
+        chain = [
+            f"drawbox=x=0:y={box_top}:w=iw:h={box_height}:color=black@0.47:t=fill"
+            f":enable='between(t,{windows[0][0]},{windows[-1][1]})'"
+        ]
+
+        def add_line(text, name, y, font, size, color, enable):
+            text_file = os.path.join(text_dir, name)
+            with open(text_file, 'w', encoding='utf-8') as f:
+                f.write(text)
+            chain.append(
+                f"drawtext=textfile={_filter_path(text_file)}{font}:fontsize={size}:fontcolor={color}"
+                f":expansion=none:x=(w-text_w)/2:y={y}:enable='{enable}'"
+            )
+
+        for idx, (verse_data, (start_time, end_time)) in enumerate(zip(scriptures, windows)):
+            verse_text, reference = _parse_verse(verse_data)
+            clean_verse = verse_text.strip('"').strip("'")
+            wrapped = textwrap.wrap(clean_verse, width=wrap_width)
+            enable = f'between(t,{start_time},{end_time})'
+
+            for line_idx, line in enumerate(wrapped):
+                add_line(line, f'{idx}_{line_idx}.txt', text_top + line_idx * line_height,
+                         verse_font, verse_font_size, 'white', enable)
+            if reference:
+                ref_top = text_top + len(wrapped) * line_height + int(20 * scale_factor)
+                add_line(reference, f'{idx}_ref.txt', ref_top,
+                         ref_font, ref_font_size, '0xC8C8C8', enable)
+
+        return ','.join(chain)
+
+    def prepare_base_clip(self, nature_video, width, height):
+        """
+        Return nature_video scaled and cropped to width x height, cached
+
+        The clip is looped for the whole video, so scaling it once here
+        saves a per-frame scale for every assembly that reuses it.
+
+        Args:
+            nature_video: Path to the source nature clip
+            width: Output width in pixels
+            height: Output height in pixels
+
+        Returns:
+            str: Path to the cached clip, or nature_video if it can't be made
+        """
+        try:
+            cache_path = _base_clip_cache_path(nature_video, width, height)
+        except OSError as e:
+            logger.warning(f'Could not read {nature_video} for the base clip cache: {e}')
+            return nature_video
+
+        if os.path.exists(cache_path):
+            os.utime(cache_path)  # mark as recently used for eviction
+            logger.info(f'Using cached base clip: {cache_path}')
+            return cache_path
+
+        os.makedirs(BASE_CLIP_CACHE_DIR, exist_ok=True)
+        partial_path = cache_path + '.part'
+        try:
+            run_ffmpeg([
+                'ffmpeg', '-y', '-i', nature_video,
+                '-vf', f'scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height}',
+                '-an', '-r', '25',
+                '-c:v', 'libx264', '-preset', 'medium', '-crf', '18', '-pix_fmt', 'yuv420p',
+                '-f', 'mp4', partial_path
+            ], logger=logger)
+            os.replace(partial_path, cache_path)
+        except Exception as e:
+            logger.warning(f'Could not prepare base clip, scaling on the fly: {e}')
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            return nature_video
+
+        logger.info(f'Cached base clip: {cache_path} ({width}x{height})')
+        _evict_base_clips()
+        return cache_path
+
+    def _verse_windows(self, count, duration, verse_timings=None):
+        """(start_time, end_time) for each verse, dynamic or evenly spaced"""
+        if count <= 0:
+            return []
+
+        if verse_timings:
+            # Use dynamic timing from narrator: each verse runs until the next
+            starts = [timing['text_appears'] for timing in verse_timings]
+            ends = starts[1:] + [duration]
+        else:
+            # Use fixed timing
+            time_per_verse = duration / count
+            starts = [idx * time_per_verse for idx in range(count)]
+            ends = [(idx + 1) * time_per_verse for idx in range(count)]
+
+        return list(zip(starts[:count], ends[:count]))
+
     def assemble_meditation_video(self, nature_videos, scriptures, music_file, duration=300, verse_timings=None, resolution="1920x1080"):
         """
         Assemble meditation video using ONE looped clip with text overlays
@@ -110,6 +568,57 @@ class MeditationVideoAssembler:
         Returns:
             str: Path to output video
         """
+        cmd, output_file, work_dir = self._prepare_assembly(
+            nature_videos, scriptures, music_file, duration, verse_timings, resolution
+        )
+        try:
+            run_ffmpeg(cmd, duration=duration, logger=logger)
+        finally:
+            # Cleanup (the single pass leaves no intermediate videos)
+            shutil.rmtree(work_dir, ignore_errors=True)
+        logger.info(f'Final video created: {output_file}')
+
+        return output_file
+
+    async def assemble_meditation_video_async(self, nature_videos, scriptures, music_file, duration=300, verse_timings=None, resolution="1920x1080"):
+        """
+        Async variant of assemble_meditation_video
+
+        Overlay/clip preparation runs in a worker thread and ffmpeg runs as
+        an asyncio subprocess, so several videos can be assembled
+        concurrently from one event loop (e.g. with asyncio.gather).
+
+        Args:
+            Same as assemble_meditation_video
+
+        Returns:
+            str: Path to output video
+        """
+        cmd, output_file, work_dir = await asyncio.to_thread(
+            self._prepare_assembly,
+            nature_videos, scriptures, music_file, duration, verse_timings, resolution
+        )
+        try:
+            await run_ffmpeg_async(cmd, duration=duration, logger=logger)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        logger.info(f'Final video created: {output_file}')
+
+        return output_file
+
+    def _prepare_assembly(self, nature_videos, scriptures, music_file, duration, verse_timings, resolution):
+        """
+        Render the verse text assets and build the single-pass ffmpeg command
+
+        The text assets go in a private work directory, so concurrent
+        assemblies never share temp files.
+
+        Returns:
+            tuple: (ffmpeg command, output video path, work directory to delete)
+        """
+        if not scriptures:
+            raise ValueError('No scriptures to assemble')
+
         # Parse resolution
         width, height = resolution.split('x')
         width, height = int(width), int(height)
@@ -119,25 +628,6 @@ class MeditationVideoAssembler:
         timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
         output_file = os.path.join(self.output_dir, f'{timestamp}_meditation_{resolution.replace("x", "_")}.mp4')
 
-        # Create scripture overlays with custom resolution
-        overlay_files = []
-        for idx, verse_data in enumerate(scriptures):
-            # Parse verse
-            if isinstance(verse_data, str):
-                if ' - ' in verse_data:
-                    verse_text, reference = verse_data.rsplit(' - ', 1)
-                else:
-                    verse_text = verse_data
-                    reference = ''
-            else:
-                # Support both 'verse' and 'text' keys
-                verse_text = verse_data.get('verse', verse_data.get('text', ''))
-                reference = verse_data.get('reference', '')
-
-            overlay_file = os.path.join(self.overlay_dir, f'scripture_{idx}.png')
-            self.create_scripture_overlay(verse_text, reference, idx, overlay_file, width, height)
-            overlay_files.append(overlay_file)
-
         # Determine timing approach
         if verse_timings:
             logger.info(f'{len(scriptures)} verses with DYNAMIC timing')
@@ -145,93 +635,123 @@ class MeditationVideoAssembler:
             time_per_verse = duration / len(scriptures)
             logger.info(f'{len(scriptures)} verses, {time_per_verse:.1f}s per verse (fixed)')
 
-        # Step 1: Loop single nature clip to fill exact duration
-        base_video = os.path.join(self.output_dir, 'base_video.mp4')
-
-        scale_cmd = [
-            'ffmpeg', '-y',
+        windows = self._verse_windows(len(scriptures), duration, verse_timings)
+        work_dir = tempfile.mkdtemp(prefix=f'{timestamp}_', dir=self.overlay_dir)
+        try:
+            cmd = self._build_command(
+                nature_videos[0], scriptures, music_file, duration, windows,
+                width, height, work_dir, output_file
+            )
+        except Exception:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+
+        return cmd, output_file, work_dir
+
+    def _build_command(self, nature_video, scriptures, music_file, duration, windows,
+                       width, height, work_dir, output_file):
+        """Build the single-pass ffmpeg command, writing text assets to work_dir"""
+        # Single ffmpeg pass: loop + scale the nature clip, draw the verse text
+        # and mux the audio, so the video is encoded exactly once. The text is
+        # burned in, so that one encode is unavoidable; looping with a concat
+        # list + -c copy would only add a second pass over the same frames.
+        # Inputs: 0 = nature clip (looped), 1 = audio, 2.. = overlay PNGs
+        inputs = self.encoder_profile['input_args'] + self.encoder_profile['decode_args'] + [
             '-stream_loop', '-1',  # Loop infinitely
-            '-i', nature_videos[0],  # Use FIRST clip only
-            '-t', str(duration),  # Stop at exact duration
-            '-vf', f'scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height}',
-            '-c:v', 'libx264', '-preset', 'medium', '-crf', '23',
-            '-r', '25',
-            '-an',  # No audio yet
-            base_video
+            '-i', self.prepare_base_clip(nature_video, width, height),  # Use FIRST clip only
+            '-i', music_file
         ]
-
-        subprocess.run(scale_cmd, check=True, capture_output=True)
-        logger.info(f'Base video created: {resolution}')
-
-        # Step 2: Build overlay filter for text overlays
-        overlay_inputs = ['-i', base_video]
-        for overlay_file in overlay_files:
-            overlay_inputs.extend(['-i', overlay_file])
-
-        overlay_filters = []
-        current_time = 0
-
-        for idx, overlay_file in enumerate(overlay_files):
-            if verse_timings:
-                # Use dynamic timing from narrator
-                start_time = verse_timings[idx]['text_appears']
-                if idx < len(verse_timings) - 1:
-                    end_time = verse_timings[idx+1]['text_appears']
-                else:
-                    end_time = duration
-            else:
-                # Use fixed timing
-                start_time = current_time
-                time_per_verse = duration / len(scriptures)
-                end_time = current_time + time_per_verse
-                current_time = end_time
-
-            if idx == 0:
-                overlay_filters.append(
-                    f"[0:v][{idx+1}:v]overlay=0:0:enable='between(t,{start_time},{end_time})'[v{idx}]"
-                )
-            else:
-                overlay_filters.append(
-                    f"[v{idx-1}][{idx+1}:v]overlay=0:0:enable='between(t,{start_time},{end_time})'[v{idx}]"
+        # A no-op on a cached base clip; still needed if the cache was bypassed
+        base_filter = f'[0:v]scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height}'
+
+        if self.use_subtitles:
+            # One libass filter renders every verse; no PNGs, one filter node
+            subtitle_file = self.write_scripture_subtitles(
+                scriptures, windows,
+                os.path.join(work_dir, 'verses.ass'),
+                width, height
+            )
+            filters = [
+                f"{base_filter},subtitles=filename={_filter_path(subtitle_file)}"
+                f"{self.encoder_profile['filter_suffix']}[vout]"
+            ]
+            prev_label = 'vout'
+        elif self.use_drawtext:
+            # No libass: draw the box and each line with native drawtext
+            text_dir = os.path.join(work_dir, 'drawtext')
+            drawtext_chain = self.build_drawtext_filter(scriptures, windows, text_dir, width, height)
+            filters = [
+                f"{base_filter},{drawtext_chain}{self.encoder_profile['filter_suffix']}[vout]"
+            ]
+            prev_label = 'vout'
+        else:
+            # Fallback for ffmpeg builds without text filters: one PNG per verse.
+            # Only one verse is on screen at a time, so each PNG is decoded
+            # once, repeated for its window and concatenated into a single
+            # stream that feeds ONE overlay filter, instead of a chain of N
+            # overlays that each evaluate enable=between(...) on every frame.
+            # ffmpeg reads the cached overlays directly; nothing to link
+            overlay_files = self.render_scripture_overlays(scriptures, width, height)
+
+            # Segment lengths come from frame-rounded window edges, so the
+            # rounding never accumulates over hundreds of verses
+            fps = 25
+            segment_frames = []
+            for overlay_file, (start_time, end_time) in zip(overlay_files, windows):
+                segment_frames.append(max(1, round(end_time * fps) - round(start_time * fps)))
+                inputs.extend(['-i', overlay_file])
+
+            # Bands vary in height with verse length; concat needs one size
+            band_height = 0
+            for overlay_file in overlay_files:
+                with Image.open(overlay_file) as img:  # reads the header only
+                    band_height = max(band_height, img.height)
+            band_height += band_height % 2  # even, for 4:2:0 chroma
+
+            filters = [f'{base_filter}[base]']
+            segments = ''
+            # Converted to YUVA 4:2:0 (overlay's native format for a yuv420p
+            # main) and padded once per verse, then the frame is repeated
+            for idx, frames in enumerate(segment_frames):
+                filters.append(
+                    f'[{idx+2}:v]format=yuva420p,pad=iw:{band_height}:0:0:color=black@0,'
+                    f'loop=loop={frames - 1}:size=1,setpts=N/{fps}/TB[s{idx}]'
                 )
+                segments += f'[s{idx}]'
+            filters.append(
+                f'{segments}concat=n={len(overlay_files)}:v=1:a=0,'
+                f'setpts=PTS+{round(windows[0][0] * fps) / fps}/TB[verses]'
+            )
+            filters.append(
+                f"[base][verses]overlay=0:{_overlay_top(height)}:eof_action=pass"
+                f"{self.encoder_profile['filter_suffix']}[vout]"
+            )
+            prev_label = 'vout'
+
+        filter_complex = ';'.join(filters)
+
+        # MusicManager hands out AAC copies when asked (aac=True), which go
+        # into the MP4 untouched
+        if music_file.lower().endswith(('.m4a', '.aac')):
+            audio_args = ['-c:a', 'copy']
+        else:
+            audio_args = ['-c:a', 'aac', '-b:a', '192k']
 
-        filter_complex = ';'.join(overlay_filters)
-
-        # Step 3: Apply text overlays
-        temp_video_with_text = os.path.join(self.output_dir, 'video_with_text.mp4')
-
-        overlay_cmd = [
+        cmd = [
             'ffmpeg', '-y'
-        ] + overlay_inputs + [
+        ] + inputs + [
             '-filter_complex', filter_complex,
-            '-map', f'[v{len(overlay_files)-1}]',
-            '-c:v', 'libx264', '-preset', 'medium', '-crf', '23',
-            '-r', '25',
-            '-t', str(duration),
-            temp_video_with_text
-        ]
-
-        subprocess.run(overlay_cmd, check=True, capture_output=True)
-        logger.info('Text overlays applied')
-
-        # Step 4: Add audio
-        audio_cmd = [
-            'ffmpeg', '-y',
-            '-i', temp_video_with_text,
-            '-i', music_file,
-            '-c:v', 'copy',
-            '-c:a', 'aac', '-b:a', '192k',
+            '-filter_complex_threads', str(self.ffmpeg_threads),
+            '-map', f'[{prev_label}]',
+            '-map', '1:a',
+            '-threads', str(self.ffmpeg_threads)
+        ] + self.codec_args + [
+            '-r', '25'
+        ] + audio_args + [
+            '-t', str(duration),  # Stop at exact duration
             '-shortest',
+            '-movflags', '+faststart',  # moov atom up front, playable while uploading
             output_file
         ]
 
-        subprocess.run(audio_cmd, check=True, capture_output=True)
-        logger.info(f'Final video created: {output_file}')
-
-        # Cleanup
-        if os.path.exists(base_video):
-            os.remove(base_video)
-        if os.path.exists(temp_video_with_text):
-            os.remove(temp_video_with_text)
-
-        return output_file
+        return cmd
@@ -11,16 +11,60 @@ import random
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from utils.logging_utils import setup_logger, get_daily_log_file
+from utils.ffmpeg_utils import run_ffmpeg
 from engines.production.incompetech_music_downloader import IncompetechMusicDownloader
 
 logger = setup_logger('music_manager', get_daily_log_file())
 
+MUSIC_EXTENSIONS = {'.mp3', '.wav', '.m4a', '.ogg'}
+
 class MusicManager:
     def __init__(self):
         self.cache_dir = 'output/cache/music'
+        self.aac_dir = os.path.join(self.cache_dir, 'aac')
         os.makedirs(self.cache_dir, exist_ok=True)
 
-    def get_peaceful_music(self, duration=300, theme='peace'):
+    def _aac_version(self, music_file):
+        """
+        Return an AAC (.m4a) copy of music_file, transcoding it once
+
+        Used when the music is muxed straight into an MP4: the cached AAC
+        copy lets every later assembly stream-copy the audio instead of
+        re-encoding it.
+
+        Args:
+            music_file: Path to a cached music file
+
+        Returns:
+            str: Path to the .m4a copy, or music_file if transcoding fails
+        """
+        if music_file.lower().endswith(('.m4a', '.aac')):
+            return music_file
+
+        name = os.path.splitext(os.path.basename(music_file))[0]
+        aac_file = os.path.join(self.aac_dir, f'{name}.m4a')
+        if os.path.exists(aac_file):
+            return aac_file
+
+        os.makedirs(self.aac_dir, exist_ok=True)
+        partial_file = aac_file + '.part'
+        try:
+            run_ffmpeg([
+                'ffmpeg', '-y', '-i', music_file,
+                '-vn', '-c:a', 'aac', '-b:a', '192k',
+                '-movflags', '+faststart',
+                '-f', 'mp4', partial_file
+            ], logger=logger)
+            os.replace(partial_file, aac_file)
+            logger.info(f'Transcoded music to AAC: {aac_file}')
+            return aac_file
+        except Exception as e:
+            logger.warning(f'Could not transcode {music_file} to AAC: {e}')
+            if os.path.exists(partial_file):
+                os.remove(partial_file)
+            return music_file
+
+    def get_peaceful_music(self, duration=300, theme='peace', aac=False):
         """
         Get peaceful background music
         1. Check for manually uploaded music
@@ -30,6 +74,9 @@ class MusicManager:
         Args:
             duration: desired length in seconds
             theme: meditation theme
+            aac: Return a cached AAC (.m4a) copy for muxing without
+                re-encoding (callers that mix or re-encode the music
+                should keep the original file)
 
         Returns:
             path to music file or None
@@ -40,20 +87,23 @@ class MusicManager:
         manual_music = os.path.join(self.cache_dir, 'peaceful_music.mp3')
         if os.path.exists(manual_music):
             logger.info(f'Using manually uploaded music: {manual_music}')
-            return manual_music
+            return self._aac_version(manual_music) if aac else manual_music
 
-        # Look for any music files in cache (excluding metadata files)
-        music_files = []
-        for ext in ['.mp3', '.wav', '.m4a', '.ogg']:
-            for f in os.listdir(self.cache_dir):
-                if f.endswith(ext) and not f.startswith('.') and not f.endswith('.txt'):
-                    music_files.append(os.path.join(self.cache_dir, f))
+        # Look for any music files in cache (excluding metadata files),
+        # in a single directory pass
+        with os.scandir(self.cache_dir) as entries:
+            music_files = [
+                entry.path for entry in entries
+                if not entry.name.startswith('.')
+                and os.path.splitext(entry.name)[1].lower() in MUSIC_EXTENSIONS
+                and entry.is_file()
+            ]
 
         if music_files:
             # Use random music file
             selected = random.choice(music_files)
             logger.info(f'Using music: {selected}')
-            return selected
+            return self._aac_version(selected) if aac else selected
 
         # No music available - auto-download from Internet Archive
         logger.warning('No music files found in cache')
@@ -67,7 +117,7 @@ class MusicManager:
                 # Use random track from downloaded collection
                 selected = random.choice(tracks)
                 logger.info(f'Using downloaded music: {selected}')
-                return selected
+                return self._aac_version(selected) if aac else selected
             else:
                 logger.error('Failed to download meditation music')
                 return None
@@ -3,6 +3,10 @@ Nature Asset Manager - Downloads beautiful nature stock videos for meditation
 """
 import os
 import requests
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from utils.logging_utils import setup_logger, get_daily_log_file
 
 logger = setup_logger('nature_assets', get_daily_log_file())
@@ -13,6 +17,23 @@ class NatureAssetManager:
         self.cache_dir = 'output/cache/nature_footage'
         os.makedirs(self.cache_dir, exist_ok=True)
 
+        # One keep-alive session for the Pexels API and CDN, shared by the
+        # download workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=16,
+            max_retries=Retry(total=3, backoff_factor=0.3)
+        )
+        self.session.mount('https://', adapter)
+
+    def _iter_cached_videos(self):
+        """Yield cached .mp4 clip paths, lazily"""
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.mp4') and entry.is_file():
+                    yield entry.path
+
     def fetch_nature_videos(self, theme='peaceful nature', count=15):
         """
         Fetch beautiful nature videos from Pexels
@@ -21,16 +42,12 @@ class NatureAssetManager:
         """
         logger.info(f'Fetching {count} nature videos: {theme}')
 
-        # Check cache
-        cached_videos = [
-            os.path.join(self.cache_dir, f)
-            for f in os.listdir(self.cache_dir)
-            if f.endswith('.mp4')
-        ]
+        # Check cache (stops scanning once `count` clips are found)
+        cached_videos = list(islice(self._iter_cached_videos(), count))
 
         if len(cached_videos) >= count:
             logger.info(f'Using {count} cached nature videos')
-            return cached_videos[:count]
+            return cached_videos
 
         if not self.pexels_key or self.pexels_key == 'YOUR_PEXELS_API_KEY':
             logger.error('No Pexels API key configured')
@@ -51,10 +68,12 @@ class NatureAssetManager:
         ]
 
         try:
-            downloaded_videos = []
+            # Collect (url, output_file) for every video first, then download
+            # them all at once instead of one after another
+            tasks = []
             query_idx = 0
 
-            while len(downloaded_videos) < count and query_idx < len(nature_queries):
+            while len(tasks) < count and query_idx < len(nature_queries):
                 query = nature_queries[query_idx]
                 logger.info(f'Searching Pexels: {query}')
 
@@ -67,13 +86,13 @@ class NatureAssetManager:
                     'size': 'medium'
                 }
 
-                response = requests.get(url, headers=headers, params=params, timeout=10)
+                response = self.session.get(url, headers=headers, params=params, timeout=10)
                 response.raise_for_status()
                 data = response.json()
 
                 if data.get('videos'):
                     for video in data['videos']:
-                        if len(downloaded_videos) >= count:
+                        if len(tasks) >= count:
                             break
 
                         # Get HD video file
@@ -84,25 +103,19 @@ class NatureAssetManager:
                         )
 
                         if hd_video:
-                            video_url = hd_video['link']
                             output_file = os.path.join(
                                 self.cache_dir,
-                                f'nature_{len(downloaded_videos) + 1}.mp4'
+                                f'nature_{len(tasks) + 1}.mp4'
                             )
-
-                            if not os.path.exists(output_file):
-                                logger.info(f'Downloading nature video {len(downloaded_videos) + 1}...')
-                                video_response = requests.get(video_url, stream=True, timeout=30)
-                                video_response.raise_for_status()
-
-                                with open(output_file, 'wb') as f:
-                                    for chunk in video_response.iter_content(chunk_size=8192):
-                                        f.write(chunk)
-
-                            downloaded_videos.append(output_file)
+                            tasks.append((hd_video['link'], output_file))
 
                 query_idx += 1
 
+            # Downloads are network-bound, so threads overlap them fine
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = executor.map(lambda task: self._download_video(*task), tasks)
+                downloaded_videos = [path for path in results if path]
+
             logger.info(f'Downloaded {len(downloaded_videos)} nature videos')
             return downloaded_videos + cached_videos[:count - len(downloaded_videos)]
 
@@ -110,6 +123,28 @@ class NatureAssetManager:
             logger.error(f'Error fetching nature videos: {e}')
             return cached_videos if cached_videos else []
 
+    def _download_video(self, video_url, output_file):
+        """Download one video to output_file, returning its path or None on failure"""
+        if os.path.exists(output_file):
+            return output_file
+
+        partial_file = output_file + '.part'
+        try:
+            logger.info(f'Downloading nature video: {os.path.basename(output_file)}')
+            with self.session.get(video_url, stream=True, timeout=30) as video_response:
+                video_response.raise_for_status()
+                with open(partial_file, 'wb') as f:
+                    for chunk in video_response.iter_content(chunk_size=1024 * 1024):
+                        f.write(chunk)
+            os.replace(partial_file, output_file)
+            return output_file
+
+        except Exception as e:
+            logger.warning(f'Could not download {os.path.basename(output_file)}: {e}')
+            if os.path.exists(partial_file):
+                os.remove(partial_file)
+            return None
+
 if __name__ == '__main__':
     manager = NatureAssetManager()
     videos = manager.fetch_nature_videos('peaceful nature', 10)
@@ -4,40 +4,191 @@ Scripture Narrator - Generates gentle TTS narration SYNCHRONIZED with text overl
 import os
 import sys
 import asyncio
+import hashlib
+import json
+import shutil
 import edge_tts
 import subprocess
+import numpy as np
+from mutagen.mp3 import MP3, HeaderNotFoundError
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from utils.logging_utils import setup_logger, get_daily_log_file
+from utils.ffmpeg_utils import run_ffmpeg_async, resolve_executable
+from utils.async_utils import run_sync, write_chunks
 
 logger = setup_logger('scripture_narrator', get_daily_log_file())
 
+# Concurrent edge-tts requests per narration (higher values risk throttling)
+TTS_CONCURRENCY = 6
+
+# Narration speed (-40% slower for meditation)
+NARRATION_RATE = '-40%'
+
+# Synthesized verses keyed by voice, rate and script, shared across runs
+NARRATION_CACHE_DIR = 'output/cache/narration'
+
+# edge-tts streams constant-bitrate audio-24khz-48kbitrate-mono-mp3, so a
+# verse's duration follows from its byte count
+EDGE_TTS_BITS_PER_SECOND = 48000
+
+# edge-tts WordBoundary offsets/durations are in 100 ns ticks
+TICKS_PER_SECOND = 10_000_000
+
+def _narration_cache_path(voice_name, script):
+    """Content-addressed cache path for a synthesized verse"""
+    key = hashlib.sha1(f'{voice_name}|{NARRATION_RATE}|{script}'.encode('utf-8')).hexdigest()
+    return os.path.join(NARRATION_CACHE_DIR, key[:2], key + '.mp3')
+
+def _sidecar_path(cache_path):
+    """JSON file holding a cached narration's timing"""
+    return os.path.splitext(cache_path)[0] + '.json'
+
+def _link_cached(cache_path, output_file):
+    """Hard-link a cached file to output_file (copy across filesystems)"""
+    if os.path.exists(output_file):
+        os.remove(output_file)
+    try:
+        os.link(cache_path, output_file)
+    except OSError:
+        shutil.copyfile(cache_path, output_file)
+
+def _parse_verse(verse_data):
+    """Split a scripture entry (string or dict) into (verse_text, reference)"""
+    if isinstance(verse_data, str):
+        if ' - ' in verse_data:
+            verse_text, reference = verse_data.rsplit(' - ', 1)
+            return verse_text, reference
+        return verse_data, ''
+    return verse_data.get('verse', verse_data.get('text', '')), verse_data.get('reference', '')
+
 class ScriptureNarrator:
     def __init__(self):
         self.output_dir = 'output/narration'
         os.makedirs(self.output_dir, exist_ok=True)
 
+        # Created lazily: a semaphore belongs to the event loop it is first used in
+        self._sem = None
+        self._sem_loop = None
+
         # Calm, soothing voices for meditation
         self.voices = {
             'female': 'en-US-JennyNeural',  # Warm, gentle female voice
             'male': 'en-US-GuyNeural'       # Calm, soothing male voice
         }
 
-    def _get_audio_duration(self, audio_file):
-        """Get duration of audio file in seconds using ffprobe"""
+    def _cached_duration(self, cache_path):
+        """Duration of a cached narration, from its .json sidecar (probed if missing)"""
+        duration_file = _sidecar_path(cache_path)
+        try:
+            with open(duration_file, 'r') as f:
+                return json.load(f)['duration']
+        except (OSError, ValueError, KeyError):
+            pass
+
+        duration = self._probe_duration(cache_path)
+        with open(duration_file, 'w') as f:
+            json.dump({'duration': duration}, f)
+        return duration
+
+    def _get_audio_durations_batch(self, cache_paths):
+        """
+        Durations of several cached narrations, resolved in one worker-thread hop
+
+        Sidecar reads and MP3 header parses take microseconds, so one
+        to_thread call for the whole batch beats one per verse; ffprobe is
+        only spawned for files mutagen cannot parse.
+        """
+        return [self._cached_duration(cache_path) for cache_path in cache_paths]
+
+    def _probe_duration(self, audio_file):
+        """Get duration of audio file in seconds (parsed in-process, ffprobe as fallback)"""
+        try:
+            return MP3(audio_file).info.length
+        except HeaderNotFoundError:
+            logger.warning(f'No MP3 header in {audio_file}, falling back to ffprobe')
+
         cmd = [
-            'ffprobe', '-v', 'error',
+            resolve_executable('ffprobe'), '-v', 'error',
             '-show_entries', 'format=duration',
             '-of', 'default=noprint_wrappers=1:nokey=1',
             audio_file
         ]
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = subprocess.run(
+            cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, text=True, close_fds=False
+        )
         return float(result.stdout.strip())
 
-    async def generate_single_verse_narration(self, verse_text, reference, voice='female', output_file=None):
-        """Generate TTS for a single verse"""
+    def _tts_semaphore(self):
+        """Semaphore capping concurrent edge-tts requests in the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._sem is None or self._sem_loop is not loop:
+            self._sem = asyncio.Semaphore(TTS_CONCURRENCY)
+            self._sem_loop = loop
+        return self._sem
+
+    async def _generate_verse_files(self, scriptures, voice):
+        """
+        Synthesize every verse concurrently (bounded by TTS_CONCURRENCY)
+
+        The returned files are the narration cache entries themselves: ffmpeg
+        reads them directly, so no per-run copies are written or deleted.
+
+        Returns:
+            list: (verse_text, reference, cache_path) per verse, in input order
+        """
+        parsed = [_parse_verse(verse_data) for verse_data in scriptures]
+        tasks = [
+            self._synthesize_verse(verse_text, reference, voice)
+            for verse_text, reference in parsed
+        ]
+        files = await asyncio.gather(*tasks)
+        return [(verse_text, reference, verse_file)
+                for (verse_text, reference), verse_file in zip(parsed, files)]
+
+    async def _mix_narration(self, placements, total_duration, output_file):
+        """
+        Mix verse narrations onto a silent track in a single ffmpeg pass
+
+        The silence comes from an inline anullsrc input, so it is never
+        encoded to disk and read back. ffmpeg runs as an asyncio subprocess,
+        so other narrations in the same loop keep making progress. amix runs
+        with normalize=0 (each verse keeps its own level) and a .wav
+        output_file is written as PCM, which skips one lossy MP3 cycle when
+        the caller re-encodes it anyway.
+
+        Args:
+            placements: List of (verse_file, start_seconds) tuples
+            total_duration: Length of the mixed track in seconds
+            output_file: Output path (.wav for PCM, anything else for MP3)
+        """
+        inputs = ['-f', 'lavfi', '-t', str(total_duration),
+                  '-i', 'anullsrc=channel_layout=stereo:sample_rate=44100']
+        filter_parts = []
+        mix_inputs = '[0:a]'
+        for idx, (verse_file, start_time) in enumerate(placements):
+            inputs.extend(['-i', verse_file])
+            delay_ms = int(start_time * 1000)
+            filter_parts.append(f"[{idx+1}:a]adelay={delay_ms}|{delay_ms}[a{idx}]")
+            mix_inputs += f'[a{idx}]'
+        filter_parts.append(f"{mix_inputs}amix=inputs={len(placements)+1}:duration=first:normalize=0[out]")
+
+        codec = 'pcm_s16le' if output_file.lower().endswith('.wav') else 'libmp3lame'
+
+        cmd = ['ffmpeg', '-y'] + inputs + [
+            '-filter_complex', ';'.join(filter_parts),
+            '-map', '[out]',
+            '-c:a', codec,
+            '-t', str(total_duration),
+            output_file
+        ]
+        await run_ffmpeg_async(cmd, duration=total_duration, logger=logger)
+
+    async def _synthesize_verse(self, verse_text, reference, voice='female'):
+        """Synthesize a verse into the narration cache (if needed) and return the cache path"""
         voice_name = self.voices.get(voice, self.voices['female'])
 
         # Clean verse text
@@ -46,12 +197,56 @@ class ScriptureNarrator:
         # Script: Read verse... pause... read reference... longer pause
         script = f'{clean_verse}... {reference}...... '
 
+        cache_path = _narration_cache_path(voice_name, script)
+        if not os.path.exists(cache_path):
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            part_file = f'{cache_path}.{os.getpid()}.{id(self)}.part'
+            # One websocket per uncached verse: edge-tts 6.x opens its own
+            # aiohttp session inside stream() and XML-escapes the text, so
+            # neither an injected session nor an SSML <break> batch is
+            # possible. The handshakes overlap under the semaphore instead.
+            # Timing is taken from the stream itself, so a fresh verse never
+            # needs a probe: audio length from the CBR byte count, and the
+            # end of the last spoken word from its WordBoundary event
+            audio_bytes = 0
+            speech_end = 0.0
+
+            async def audio_chunks(communicate):
+                nonlocal audio_bytes, speech_end
+                async for chunk in communicate.stream():
+                    if chunk['type'] == 'audio':
+                        audio_bytes += len(chunk['data'])
+                        yield chunk['data']
+                    elif chunk['type'] == 'WordBoundary':
+                        speech_end = (chunk['offset'] + chunk['duration']) / TICKS_PER_SECOND
+
+            try:
+                async with self._tts_semaphore():
+                    communicate = edge_tts.Communicate(script, voice_name, rate=NARRATION_RATE)
+                    await write_chunks(audio_chunks(communicate), part_file)
+                with open(_sidecar_path(cache_path), 'w') as f:
+                    json.dump({
+                        'duration': audio_bytes * 8 / EDGE_TTS_BITS_PER_SECOND,
+                        'speech_end': speech_end
+                    }, f)
+                os.replace(part_file, cache_path)
+            except Exception:
+                # e.g. edge-tts NoAudioReceived: leave no partial verse behind
+                if os.path.exists(part_file):
+                    os.remove(part_file)
+                raise
+        else:
+            logger.info(f'Narration cache hit: {reference}')
+
+        return cache_path
+
+    async def generate_single_verse_narration(self, verse_text, reference, voice='female', output_file=None):
+        """Generate TTS for a single verse, reusing the narration cache when possible"""
         if not output_file:
             output_file = os.path.join(self.output_dir, 'temp_verse.mp3')
 
-        # Generate TTS (-40% slower for meditation)
-        communicate = edge_tts.Communicate(script, voice_name, rate='-40%')
-        await communicate.save(output_file)
+        cache_path = await self._synthesize_verse(verse_text, reference, voice)
+        _link_cached(cache_path, output_file)
 
         return output_file
 
@@ -69,7 +264,7 @@ class ScriptureNarrator:
         Args:
             scriptures: List of scripture dicts
             voice: 'female' or 'male'
-            output_file: Output path
+            output_file: Output path (default WAV; it is re-encoded when mixed with music)
             delay_before_reading: Seconds to wait after text appears (default 3)
             pause_after_reading: Seconds to wait after voiceover finishes (default 7)
 
@@ -77,33 +272,20 @@ class ScriptureNarrator:
             dict: Contains output_file, timings array, and total_duration
         """
         if not output_file:
-            output_file = os.path.join(self.output_dir, 'scripture_narration.mp3')
+            output_file = os.path.join(self.output_dir, 'scripture_narration.wav')
 
         logger.info(f'Generating DYNAMIC narration: {len(scriptures)} verses')
         logger.info(f'  Delay before reading: {delay_before_reading}s')
         logger.info(f'  Pause after reading: {pause_after_reading}s')
 
-        # Step 1: Generate all verse narrations and measure durations
-        verse_narrations = []
-        for idx, verse_data in enumerate(scriptures):
-            # Parse verse
-            if isinstance(verse_data, str):
-                if ' - ' in verse_data:
-                    verse_text, reference = verse_data.rsplit(' - ', 1)
-                else:
-                    verse_text = verse_data
-                    reference = ''
-            else:
-                verse_text = verse_data.get('verse', verse_data.get('text', ''))
-                reference = verse_data.get('reference', '')
-
-            # Generate narration file
-            verse_file = os.path.join(self.output_dir, f'verse_{idx}_narration.mp3')
-            await self.generate_single_verse_narration(verse_text, reference, voice, verse_file)
-
-            # Measure actual duration
-            duration = self._get_audio_duration(verse_file)
+        # Step 1: Generate all verse narrations concurrently and measure durations
+        verse_files = await self._generate_verse_files(scriptures, voice)
+        durations = await asyncio.to_thread(
+            self._get_audio_durations_batch, [verse_file for _, _, verse_file in verse_files]
+        )
 
+        verse_narrations = []
+        for idx, ((verse_text, reference, verse_file), duration) in enumerate(zip(verse_files, durations)):
             verse_narrations.append({
                 'file': verse_file,
                 'duration': duration,
@@ -113,78 +295,38 @@ class ScriptureNarrator:
 
             logger.info(f'Verse {idx+1} ({reference}): narration duration = {duration:.1f}s')
 
-        # Step 2: Calculate dynamic timings
-        timings = []
-        current_time = 0
-
-        for idx, verse_info in enumerate(verse_narrations):
-            text_appears = current_time
-            narration_starts = text_appears + delay_before_reading
-            narration_ends = narration_starts + verse_info['duration']
-            next_text_time = narration_ends + pause_after_reading
+        # Step 2: Calculate dynamic timings: each verse occupies
+        # delay + narration + pause, and its text appears when the previous one ends
+        duration_array = np.array(durations, dtype=float)
+        slot_ends = np.cumsum(delay_before_reading + duration_array + pause_after_reading)
+        text_appears = np.concatenate(([0.0], slot_ends[:-1]))
+        narration_starts = text_appears + delay_before_reading
+        narration_ends = narration_starts + duration_array
 
+        timings = []
+        for idx, (verse_info, appears, starts, ends) in enumerate(zip(
+                verse_narrations, text_appears.tolist(), narration_starts.tolist(), narration_ends.tolist())):
             timings.append({
                 'index': idx,
-                'text_appears': text_appears,
-                'narration_starts': narration_starts,
-                'narration_ends': narration_ends,
+                'text_appears': appears,
+                'narration_starts': starts,
+                'narration_ends': ends,
                 'narration_duration': verse_info['duration'],
                 'reference': verse_info['reference']
             })
 
-            logger.info(f'Verse {idx+1} timing: text@{text_appears:.1f}s, voice@{narration_starts:.1f}s-{narration_ends:.1f}s')
-
-            current_time = next_text_time
+            logger.info(f'Verse {idx+1} timing: text@{appears:.1f}s, voice@{starts:.1f}s-{ends:.1f}s')
 
         # Total duration is when last narration ends + final pause
         total_duration = timings[-1]['narration_ends'] + pause_after_reading
         logger.info(f'Total video duration: {total_duration:.1f}s ({total_duration/60:.1f} minutes)')
 
-        # Step 3: Create combined narration with silence base
-        silence_file = os.path.join(self.output_dir, 'silence_base.mp3')
-        cmd = [
-            'ffmpeg', '-y',
-            '-f', 'lavfi',
-            '-i', f'anullsrc=channel_layout=stereo:sample_rate=44100',
-            '-t', str(total_duration),
-            '-c:a', 'libmp3lame',
-            silence_file
-        ]
-        subprocess.run(cmd, check=True, capture_output=True)
-
-        # Build FFmpeg filter to overlay each verse at narration_starts time
-        filter_parts = []
-        for idx, timing in enumerate(timings):
-            delay_ms = int(timing['narration_starts'] * 1000)
-            filter_parts.append(f"[{idx+1}:a]adelay={delay_ms}|{delay_ms}[a{idx}]")
-
-        # Mix all delayed verse audios
-        mix_inputs = '[0:a]'
-        for idx in range(len(timings)):
-            mix_inputs += f'[a{idx}]'
-        mix_filter = f"{mix_inputs}amix=inputs={len(timings)+1}:duration=first[out]"
-
-        full_filter = ';'.join(filter_parts) + ';' + mix_filter if filter_parts else mix_filter
-
-        # Build FFmpeg command
-        inputs = ['-i', silence_file]
-        for verse_info in verse_narrations:
-            inputs.extend(['-i', verse_info['file']])
-
-        cmd = ['ffmpeg', '-y'] + inputs + [
-            '-filter_complex', full_filter,
-            '-map', '[out]',
-            '-c:a', 'libmp3lame',
-            output_file
-        ]
-
-        subprocess.run(cmd, check=True, capture_output=True)
-
-        # Cleanup temporary files
-        os.remove(silence_file)
-        for verse_info in verse_narrations:
-            if os.path.exists(verse_info['file']):
-                os.remove(verse_info['file'])
+        # Step 3: Overlay each verse at its narration_starts time on inline silence
+        await self._mix_narration(
+            [(verse_info['file'], timing['narration_starts'])
+             for verse_info, timing in zip(verse_narrations, timings)],
+            total_duration, output_file
+        )
 
         logger.info(f'Dynamic narration complete: {output_file}')
 
@@ -217,29 +359,16 @@ class ScriptureNarrator:
         # Calculate timing
         time_per_verse = duration / len(scriptures)
 
-        # Generate individual verse narrations
-        verse_audio_files = []
-        for idx, verse_data in enumerate(scriptures):
-            # Parse verse
-            if isinstance(verse_data, str):
-                if ' - ' in verse_data:
-                    verse_text, reference = verse_data.rsplit(' - ', 1)
-                else:
-                    verse_text = verse_data
-                    reference = ''
-            else:
-                verse_text = verse_data.get('verse', verse_data.get('text', ''))
-                reference = verse_data.get('reference', '')
-
-            # Generate this verse's narration
-            verse_file = os.path.join(self.output_dir, f'verse_{idx}_narration.mp3')
-            await self.generate_single_verse_narration(verse_text, reference, voice, verse_file)
-
-            # Calculate when this verse's text appears
-            verse_start_time = idx * time_per_verse
-            # Narration should start AFTER the delay
-            narration_start_time = verse_start_time + delay_per_verse
+        # Generate individual verse narrations concurrently
+        verse_files = await self._generate_verse_files(scriptures, voice)
+
+        # Text appears at evenly spaced times; narration starts AFTER the delay
+        verse_start_times = np.arange(len(verse_files)) * time_per_verse
+        narration_start_times = verse_start_times + delay_per_verse
 
+        verse_audio_files = []
+        for idx, ((verse_text, reference, verse_file), verse_start_time, narration_start_time) in enumerate(zip(
+                verse_files, verse_start_times.tolist(), narration_start_times.tolist())):
             verse_audio_files.append({
                 'file': verse_file,
                 'start_time': narration_start_time
@@ -247,62 +376,18 @@ class ScriptureNarrator:
 
             logger.info(f'Verse {idx+1}: Text appears at {verse_start_time:.1f}s, narration starts at {narration_start_time:.1f}s')
 
-        # Use FFmpeg to combine all verses with proper timing
-        # Create a silent base audio of the full duration
-        silence_file = os.path.join(self.output_dir, 'silence_base.mp3')
-        cmd = [
-            'ffmpeg', '-y',
-            '-f', 'lavfi',
-            '-i', f'anullsrc=channel_layout=stereo:sample_rate=44100',
-            '-t', str(duration),
-            '-c:a', 'libmp3lame',
-            silence_file
-        ]
-        subprocess.run(cmd, check=True, capture_output=True)
-
-        # Build FFmpeg filter to overlay each verse at the right time
-        filter_parts = []
-        for idx, verse_info in enumerate(verse_audio_files):
-            # Delay this verse's audio to start at the correct time
-            filter_parts.append(f"[{idx+1}:a]adelay={int(verse_info['start_time'] * 1000)}|{int(verse_info['start_time'] * 1000)}[a{idx}]")
-
-        # Mix all delayed verse audios with the silence base
-        mix_inputs = '[0:a]'
-        for idx in range(len(verse_audio_files)):
-            mix_inputs += f'[a{idx}]'
-
-        mix_filter = f"{mix_inputs}amix=inputs={len(verse_audio_files)+1}:duration=first[out]"
-
-        # Combine filters
-        full_filter = ';'.join(filter_parts) + ';' + mix_filter if filter_parts else mix_filter
-
-        # Build FFmpeg command
-        input_params = ['-i', silence_file]
-        for verse_info in verse_audio_files:
-            input_params.extend(['-i', verse_info['file']])
-
-        cmd = ['ffmpeg', '-y'] + input_params + [
-            '-filter_complex', full_filter,
-            '-map', '[out]',
-            '-c:a', 'libmp3lame',
-            '-t', str(duration),
-            output_file
-        ]
-
-        subprocess.run(cmd, check=True, capture_output=True)
-
-        # Cleanup temporary files
-        os.remove(silence_file)
-        for verse_info in verse_audio_files:
-            if os.path.exists(verse_info['file']):
-                os.remove(verse_info['file'])
+        # Use FFmpeg to combine all verses with proper timing on inline silence
+        await self._mix_narration(
+            [(verse_info['file'], verse_info['start_time']) for verse_info in verse_audio_files],
+            duration, output_file
+        )
 
         logger.info(f'SYNCHRONIZED scripture narration complete: {output_file}')
         return output_file
 
     def generate_narration_sync(self, scriptures, duration, voice='female', output_file=None, delay_per_verse=3):
-        """Synchronous wrapper for async narration generation"""
-        return asyncio.run(self.generate_scripture_narration_synced(scriptures, duration, voice, output_file, delay_per_verse))
+        """Synchronous wrapper for async narration generation (reuses this thread's event loop)"""
+        return run_sync(self.generate_scripture_narration_synced(scriptures, duration, voice, output_file, delay_per_verse))
 
 if __name__ == '__main__':
     # Test
@@ -4,16 +4,51 @@ Creates screenshot-worthy text overlays for ChatGPT prompts and key information
 """
 import os
 import sys
+import functools
+import concurrent.futures
 from pathlib import Path
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
-import textwrap
 import re
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from utils.logging_utils import setup_logger, get_daily_log_file
+from utils.text_layout import wrap_text
 
 logger = setup_logger('text_overlay_gen', get_daily_log_file())
 
+TITLE_FONT_PATH = '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'
+TEXT_FONT_PATH = '/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf'
+
+@functools.lru_cache(maxsize=32)
+def _get_font(path, size):
+    """Load a TrueType font once per (path, size) per process"""
+    return ImageFont.truetype(path, size)
+
+@functools.lru_cache(maxsize=None)
+def _load_fonts():
+    """Return (title_font, text_font), falling back to Pillow's default font"""
+    try:
+        return _get_font(TITLE_FONT_PATH, 60), _get_font(TEXT_FONT_PATH, 40)
+    except OSError:
+        return ImageFont.load_default(), ImageFont.load_default()
+
+def _init_fonts():
+    """ProcessPoolExecutor initializer: load fonts before the first task"""
+    _load_fonts()
+
+# Prompts in quotes after action verbs
+PROMPT_PATTERN = re.compile(
+    r'["\'](Act as|You are|Create|Generate|Analyze|Help me|I need|Compare|Identify)[^"\']{30,}["\']',
+    re.IGNORECASE | re.DOTALL
+)
+
+# "Step 1", "Step 2" checklist lines
+STEP_PATTERN = re.compile(r'(Step \d+:[^\n]{20,150})', re.IGNORECASE)
+
+# Numbered list lines with savings/results
+RESULT_PATTERN = re.compile(r'(\d+\.[^\n]{30,120}[\$\d][^\n]{0,50})')
+
 class TextOverlayGenerator:
     def __init__(self, output_dir='output/overlays'):
         self.output_dir = Path(output_dir)
@@ -27,13 +62,17 @@ class TextOverlayGenerator:
         self.highlight_color = (255, 215, 0)  # Gold for important text
         self.border_color = (255, 215, 0)
 
+        # Box position in the frame; overlays are saved cropped to the box and
+        # composited at this offset
+        self.box_x = 100
+        self.box_y = 150
+
     def extract_prompts_from_script(self, script):
         """Extract ChatGPT prompts from script"""
         prompts = []
 
         # Pattern 1: Prompts in quotes after action verbs
-        pattern1 = r'["\'](Act as|You are|Create|Generate|Analyze|Help me|I need|Compare|Identify)[^"\']{30,}["\']'
-        matches1 = re.findall(pattern1, script, re.IGNORECASE | re.DOTALL)
+        matches1 = PROMPT_PATTERN.findall(script)
 
         for match in matches1:
             prompt_text = match.strip('"\'')
@@ -45,8 +84,7 @@ class TextOverlayGenerator:
                 })
 
         # Pattern 2: Look for "Step 1", "Step 2" checklists
-        pattern2 = r'(Step \d+:[^\n]{20,150})'
-        matches2 = re.findall(pattern2, script, re.IGNORECASE)
+        matches2 = STEP_PATTERN.findall(script)
 
         if len(matches2) >= 3:
             steps_text = '\n'.join(matches2[:5])
@@ -57,8 +95,9 @@ class TextOverlayGenerator:
             })
 
         # Pattern 3: Look for numbered lists with savings/results
-        pattern3 = r'(\d+\.[^\n]{30,120}[\$\d][^\n]{0,50})'
-        matches3 = re.findall(pattern3, script)
+        # (kept as its own scan: a step line may also contain a numbered item,
+        # which an alternation with pattern 2 would no longer report)
+        matches3 = RESULT_PATTERN.findall(script)
 
         if len(matches3) >= 3:
             results_text = '\n'.join(matches3[:5])
@@ -74,40 +113,31 @@ class TextOverlayGenerator:
     def create_text_overlay(self, text, title, overlay_type='chatgpt_prompt', output_file=None):
         """Create a text overlay image"""
 
-        # Create image with semi-transparent background
-        img = Image.new('RGBA', (self.width, self.height), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
-
-        # Try to load a nice font, fallback to default
-        try:
-            title_font = ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf', 60)
-            text_font = ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf', 40)
-        except:
-            title_font = ImageFont.load_default()
-            text_font = ImageFont.load_default()
+        # Fonts are loaded once per process, falling back to the default font
+        title_font, text_font = _load_fonts()
 
         # Calculate centered box dimensions
-        padding = 100
-        box_width = self.width - (padding * 2)
-        box_x = padding
-        box_y = 150
+        box_x = self.box_x
+        box_y = self.box_y
+        box_width = self.width - (box_x * 2)
 
-        # Wrap text to fit width
-        max_chars_per_line = 50
+        # Wrap text to the box's inner width (60px margin on each side)
+        text_margin = 60
+        max_text_width = box_width - (text_margin * 2)
         wrapped_lines = []
         for line in text.split('\n'):
-            wrapped = textwrap.fill(line, width=max_chars_per_line)
-            wrapped_lines.extend(wrapped.split('\n'))
+            wrapped_lines.extend(wrap_text(line, text_font, max_text_width) or [''])
 
         # Calculate box height based on content
         line_height = 55
         box_height = len(wrapped_lines) * line_height + 250
 
-        # Draw semi-transparent background box
-        draw.rectangle(
-            [(box_x, box_y), (box_x + box_width, box_y + box_height)],
-            fill=self.bg_color
-        )
+        # Transparent canvas with the semi-transparent box filled in one array
+        # slice (ImageDraw.rectangle includes the end row/column, so +1)
+        canvas = np.zeros((self.height, self.width, 4), dtype=np.uint8)
+        canvas[box_y:box_y + box_height + 1, box_x:box_x + box_width + 1] = self.bg_color
+        img = Image.fromarray(canvas, 'RGBA')
+        draw = ImageDraw.Draw(img)
 
         # Draw border
         border_width = 8
@@ -136,40 +166,62 @@ class TextOverlayGenerator:
         # Draw wrapped text
         text_y = line_y + 40
         for line in wrapped_lines:
-            draw.text((box_x + 60, text_y), line, fill=self.text_color, font=text_font)
+            draw.text((box_x + text_margin, text_y), line, fill=self.text_color, font=text_font)
             text_y += line_height
 
+        # Everything is drawn inside the box, so keep only the box: ffmpeg then
+        # alpha-blends the box area at (box_x, box_y) instead of a full frame
+        # that is mostly transparent
+        img = img.crop((box_x, box_y, box_x + box_width + 1, min(self.height, box_y + box_height + 1)))
+
         # Save overlay
         if not output_file:
             timestamp = os.path.basename(output_file) if output_file else 'overlay'
             output_file = self.output_dir / f'{timestamp}_{overlay_type}.png'
 
-        img.save(output_file, 'PNG')
+        # Pipeline intermediate (decoded again by ffmpeg): fastest deflate.
+        # It stays RGBA: the video must show through the semi-transparent box
+        img.save(output_file, 'PNG', compress_level=1)
         logger.info(f'Created text overlay: {output_file}')
 
         return str(output_file)
 
     def generate_overlays_from_script(self, script, base_name='overlay'):
-        """Generate all text overlays from a script"""
+        """Generate all text overlays from a script, rendered in parallel across CPU cores"""
 
         # Extract screenshot-worthy moments
         prompts = self.extract_prompts_from_script(script)
+        if not prompts:
+            logger.info('Generated 0 text overlays')
+            return []
+
+        output_files = [
+            str(self.output_dir / f'{base_name}_{i+1}_{prompt_data["type"]}.png')
+            for i, prompt_data in enumerate(prompts)
+        ]
+
+        # Each overlay is an independent draw + PNG encode; the bound method
+        # pickles with this generator's (plain-attribute) state
+        workers = min(os.cpu_count() or 1, len(prompts))
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_fonts
+        ) as executor:
+            overlay_paths = list(executor.map(
+                self.create_text_overlay,
+                [prompt_data['text'] for prompt_data in prompts],
+                [prompt_data['title'] for prompt_data in prompts],
+                [prompt_data['type'] for prompt_data in prompts],
+                output_files
+            ))
 
         overlays = []
-        for i, prompt_data in enumerate(prompts):
-            output_file = self.output_dir / f'{base_name}_{i+1}_{prompt_data["type"]}.png'
-
-            overlay_path = self.create_text_overlay(
-                text=prompt_data['text'],
-                title=prompt_data['title'],
-                overlay_type=prompt_data['type'],
-                output_file=str(output_file)
-            )
-
+        for prompt_data, overlay_path in zip(prompts, overlay_paths):
             overlays.append({
                 'file': overlay_path,
                 'type': prompt_data['type'],
                 'text': prompt_data['text'],
+                'x': self.box_x,
+                'y': self.box_y,
                 'duration': 8 if prompt_data['type'] == 'chatgpt_prompt' else 5
             })
 
@@ -4,14 +4,32 @@ Creates clickable thumbnails using Pillow (reusable for any project)
 """
 import os
 import sys
+import functools
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from PIL import Image, ImageDraw, ImageFont
 from datetime import datetime
 from utils.logging_utils import setup_logger, get_daily_log_file
+from utils.text_layout import wrap_text
 
 logger = setup_logger('thumbnail_gen', get_daily_log_file())
 
+TITLE_FONT_PATH = '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'
+SUBTITLE_FONT_PATH = '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+
+@functools.lru_cache(maxsize=32)
+def _get_font(path, size):
+    """Load a TrueType font once per (path, size) per process"""
+    return ImageFont.truetype(path, size)
+
+@functools.lru_cache(maxsize=None)
+def _load_fonts():
+    """Return (title_font, subtitle_font), falling back to Pillow's default font"""
+    try:
+        return _get_font(TITLE_FONT_PATH, 80), _get_font(SUBTITLE_FONT_PATH, 40)
+    except OSError:
+        return ImageFont.load_default(), ImageFont.load_default()
+
 class ThumbnailGenerator:
     def __init__(self):
         self.width = 1280
@@ -27,39 +45,12 @@ class ThumbnailGenerator:
         img = Image.new('RGB', (self.width, self.height), self.bg_color)
         draw = ImageDraw.Draw(img)
         
-        # Try to load a font, fallback to default
-        try:
-            # Try system fonts
-            title_font = ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf', 80)
-            subtitle_font = ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', 40)
-        except:
-            # Fallback to default
-            title_font = ImageFont.load_default()
-            subtitle_font = ImageFont.load_default()
+        # Fonts are loaded once per process, falling back to the default font
+        title_font, subtitle_font = _load_fonts()
         
         # Add title text (wrap if too long)
         max_width = self.width - 100
-        words = title.split()
-        lines = []
-        current_line = []
-        
-        for word in words:
-            test_line = ' '.join(current_line + [word])
-            try:
-                bbox = draw.textbbox((0, 0), test_line, font=title_font)
-                width = bbox[2] - bbox[0]
-            except:
-                width = len(test_line) * 40  # Rough estimate
-            
-            if width < max_width:
-                current_line.append(word)
-            else:
-                if current_line:
-                    lines.append(' '.join(current_line))
-                current_line = [word]
-        
-        if current_line:
-            lines.append(' '.join(current_line))
+        lines = wrap_text(title, title_font, max_width)
         
         # Draw title lines
         y_offset = 200
@@ -4,12 +4,12 @@ Converts script to voiceover using free Edge-TTS
 """
 import os
 import sys
-import asyncio
 import re
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 import edge_tts
 from utils.logging_utils import setup_logger, get_daily_log_file
+from utils.async_utils import run_sync
 from engines.content.script_cleaner import ScriptCleaner
 
 logger = setup_logger('tts_engine', get_daily_log_file())
@@ -45,8 +45,8 @@ class TTSEngine:
         return output_file
 
     def generate(self, text, output_file, voice=None):
-        """Generate TTS audio (sync wrapper)"""
-        return asyncio.run(self.generate_async(text, output_file, voice))
+        """Generate TTS audio (sync wrapper, reuses this thread's event loop)"""
+        return run_sync(self.generate_async(text, output_file, voice))
 
     def text_to_speech(self, script, output_path='output/audio', voice_type='male_professional'):
         """Convert script to speech file"""
@@ -4,113 +4,234 @@ Combines voiceover + stock footage + visual assets (slides, images, graphics) us
 """
 import os
 import sys
+import asyncio
 import subprocess
+import json
 import random
+import shutil
+import tempfile
+import mutagen
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from datetime import datetime
 from utils.logging_utils import setup_logger, get_daily_log_file
+from utils.ffmpeg_utils import run_ffmpeg, run_ffmpeg_async, select_h264_encoder, H264_ENCODER_PROFILES
 
 logger = setup_logger('video_assembler', get_daily_log_file())
 
+# Every segment (stock cut or still image) is normalized to the same size,
+# SAR, frame rate and pixel format so the concat filter can join them
+SEGMENT_FILTER = (
+    'scale=1920:1080:force_original_aspect_ratio=decrease,'
+    'pad=1920:1080:(ow-iw)/2:(oh-ih)/2,setsar=1,fps=30,format=yuv420p'
+)
+
+# Decoder threads per segment input. ffmpeg opens every segment input up
+# front and would otherwise give each decoder a full set of frame threads;
+# capping them leaves the cores to the filter graph and the encoder
+SEGMENT_DECODE_THREADS = 2
+
+# Packets buffered per demuxer thread for the narration input; ffmpeg 6+
+# reads each input in its own thread and the default queue of 8 stalls them.
+# (-seekable is left out: it is an HTTP protocol option and these inputs are
+# local files.)
+INPUT_QUEUE_ARGS = ['-thread_queue_size', '1024']
+
+# Rate control per encoder for the assembler's 2 Mb/s target (the shared
+# profiles encode at constant quality)
+_BITRATE_CODEC_ARGS = {
+    'h264_nvenc': ['-c:v', 'h264_nvenc', '-preset', 'p4', '-rc', 'vbr', '-b:v', '2M'],
+    'h264_qsv': ['-c:v', 'h264_qsv', '-preset', 'medium', '-b:v', '2M'],
+    'h264_vaapi': ['-c:v', 'h264_vaapi', '-b:v', '2M'],
+    'libx264': ['-c:v', 'libx264', '-b:v', '2M'],
+}
+
+# MP4 muxer flags for finished videos: the index is moved to the front for
+# progressive playback
+FINAL_MOVFLAGS = ['-movflags', '+faststart']
+
+def _movflags(output_file, flags):
+    """flags if output_file is an MP4, else nothing (other muxers reject them)"""
+    return flags if output_file.lower().endswith('.mp4') else []
+
+def _file_key(path):
+    """(path, size, mtime) identifying one version of a file"""
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
 class VideoAssembler:
     def __init__(self):
         self.temp_dir = 'output/cache/temp'
         os.makedirs(self.temp_dir, exist_ok=True)
 
-    def get_audio_duration(self, audio_file):
-        """Get duration of audio file"""
+        # (path, size, mtime) -> ffprobe result / duration; stock clips
+        # recur across segments
+        self._probe_cache = {}
+        self._duration_cache = {}
+
+        # Hardware H.264 encoder when one works on this machine, else libx264;
+        # VIDEO_ASSEMBLER_ENCODER forces a profile. Inputs are still decoded
+        # in software: segments are many short cuts where hwaccel setup costs
+        # more than it saves
+        self.encoder = select_h264_encoder(os.environ.get('VIDEO_ASSEMBLER_ENCODER'))
+        self.encoder_profile = H264_ENCODER_PROFILES[self.encoder]
+        self.codec_args = _BITRATE_CODEC_ARGS[self.encoder]
+        if self.encoder != 'libx264':
+            logger.info(f'Using hardware encoder: {self.encoder}')
+
+    def probe_media(self, media_file):
+        """
+        ffprobe format and stream info for a file (probed once per file version)
+
+        Args:
+            media_file: Audio or video file
+
+        Returns:
+            dict: ffprobe JSON output with 'format' and 'streams'
+        """
+        cache_key = _file_key(media_file)
+        if cache_key in self._probe_cache:
+            return self._probe_cache[cache_key]
+
         cmd = [
             'ffprobe',
             '-v', 'error',
-            '-show_entries', 'format=duration',
-            '-of', 'default=noprint_wrappers=1:nokey=1',
-            audio_file
+            '-print_format', 'json',
+            '-show_format',
+            '-show_streams',
+            media_file
         ]
 
         result = subprocess.run(cmd, capture_output=True, text=True)
-        return float(result.stdout.strip())
+        data = json.loads(result.stdout)
+        self._probe_cache[cache_key] = data
+        return data
+
+    def get_audio_duration(self, audio_file):
+        """
+        Get duration of audio or video file (once per file version)
+
+        MP3 and MP4 headers are parsed in-process with mutagen; ffprobe is
+        only spawned for files mutagen cannot read.
+        """
+        cache_key = _file_key(audio_file)
+        if cache_key in self._duration_cache:
+            return self._duration_cache[cache_key]
+
+        try:
+            media = mutagen.File(audio_file)
+        except mutagen.MutagenError:
+            media = None
+
+        if media is not None and media.info.length:
+            duration = media.info.length
+        else:
+            duration = float(self.probe_media(audio_file)['format']['duration'])
+        self._duration_cache[cache_key] = duration
+        return duration
 
     def get_video_duration(self, video_file):
         """Get duration of video file"""
         return self.get_audio_duration(video_file)
 
-    def image_to_video(self, image_file, duration, output_file):
-        """Convert static image to video segment"""
-        cmd = [
-            'ffmpeg',
-            '-y',
-            '-loop', '1',
-            '-i', image_file,
-            '-c:v', 'libx264',
-            '-t', str(duration),
-            '-pix_fmt', 'yuv420p',
-            '-vf', 'scale=1920:1080:force_original_aspect_ratio=decrease,pad=1920:1080:(ow-iw)/2:(oh-ih)/2',
-            '-b:v', '2M',
-            output_file
-        ]
+    def _overlay_filters(self, overlays, first_input, in_label, out_label):
+        """
+        Filter chain compositing text overlay images at their timestamps
+
+        Args:
+            overlays: Overlay dicts (file, optional duration/x/y)
+            first_input: ffmpeg input index of the first overlay image
+            in_label: Label of the video to draw on, e.g. '[0:v]'
+            out_label: Label for the composited video
+
+        Returns:
+            list: filter_complex parts, one overlay filter each
+        """
+        # A linear chain is kept on purpose: outside its enable window an
+        # overlay filter passes frames through untouched, so chain depth costs
+        # next to nothing, and the inputs are small cropped stills. A tree of
+        # overlays would composite the stills onto each other rather than the
+        # frame, and a full-frame transparent overlay track would blend every
+        # pixel of every frame instead.
+        start_times = [120, 270, 330]
+        count = len(overlays)
+
+        # Chain labels: labels[i] feeds overlay i, labels[i + 1] is its output
+        labels = [in_label] + [f'[tmp{i}]' for i in range(1, count)] + [out_label]
+        # The encoder's upload/format conversion follows the last overlay
+        suffixes = [''] * (count - 1) + [self.encoder_profile['filter_suffix']]
+
+        filter_parts = []
+        for i, overlay_data in enumerate(overlays):
+            start_time = start_times[i] if i < len(start_times) else 180 + (i * 60)
+            end_time = start_time + overlay_data.get('duration', 8)
 
-        subprocess.run(cmd, capture_output=True)
-        return output_file
+            # Overlays may be cropped to their content; x/y place them in the frame
+            overlay_x = overlay_data.get('x', 0)
+            overlay_y = overlay_data.get('y', 0)
 
-    def create_video_segment(self, video_clip, start_time, duration, output_file):
-        """Create a video segment from clip"""
-        cmd = [
-            'ffmpeg',
-            '-y',
-            '-ss', str(start_time),
-            '-i', video_clip,
-            '-t', str(duration),
-            '-c:v', 'libx264',
-            '-c:a', 'aac',
-            '-b:v', '2M',
-            output_file
-        ]
-
-        subprocess.run(cmd, capture_output=True)
-        return output_file
+            filter_parts.append(
+                f"{labels[i]}[{first_input + i}:v]overlay={overlay_x}:{overlay_y}"
+                f":enable='between(t,{start_time},{end_time})'{suffixes[i]}{labels[i + 1]}"
+            )
 
-    def concatenate_clips(self, clip_list, output_file):
-        """Concatenate multiple video clips"""
-        concat_file = os.path.join(self.temp_dir, 'concat_list.txt')
+        return filter_parts
+
+    def assemble_video_with_visual_assets(self, audio_file, stock_clips, visual_assets=None, output_path='output/videos', overlays=None):
+        """
+        Assemble video mixing stock footage with visual assets (slides, images, graphics)
+
+        Text overlays passed here are composited in the same ffmpeg run, so
+        the video is encoded once instead of again by add_text_overlays_to_video.
+        """
+        # Each run encodes inside its own work directory and moves the
+        # finished file to its own per-run name, so concurrent runs never
+        # write the same file and a failed encode leaves no partial video
+        with tempfile.TemporaryDirectory(dir=self.temp_dir) as work_dir:
+            cmd, work_output, result = self._prepare_assembly(
+                audio_file, stock_clips, visual_assets, output_path, overlays, work_dir
+            )
+            run_ffmpeg(cmd, duration=result['duration'], logger=logger)
+            shutil.move(work_output, result['video_file'])
+        logger.info(f'Video assembled: {result["video_file"]}')
+
+        return result
+
+    async def assemble_video_with_visual_assets_async(self, audio_file, stock_clips, visual_assets=None, output_path='output/videos', overlays=None):
+        """
+        Async variant of assemble_video_with_visual_assets
+
+        Clip probing and command building run in a worker thread and ffmpeg
+        runs as an asyncio subprocess, so the encode can overlap other work
+        (e.g. thumbnail rendering or another video's encode) in one event loop.
+
+        Args:
+            Same as assemble_video_with_visual_assets
+
+        Returns:
+            dict: Same as assemble_video_with_visual_assets
+        """
+        with tempfile.TemporaryDirectory(dir=self.temp_dir) as work_dir:
+            cmd, work_output, result = await asyncio.to_thread(
+                self._prepare_assembly,
+                audio_file, stock_clips, visual_assets, output_path, overlays, work_dir
+            )
+            await run_ffmpeg_async(cmd, duration=result['duration'], logger=logger)
+            shutil.move(work_output, result['video_file'])
+        logger.info(f'Video assembled: {result["video_file"]}')
 
-        with open(concat_file, 'w') as f:
-            for clip in clip_list:
-                f.write(f"file '{os.path.abspath(clip)}'\n")
+        return result
 
-        cmd = [
-            'ffmpeg',
-            '-y',
-            '-f', 'concat',
-            '-safe', '0',
-            '-i', concat_file,
-            '-c', 'copy',
-            output_file
-        ]
+    def _prepare_assembly(self, audio_file, stock_clips, visual_assets, output_path, overlays, work_dir):
+        """
+        Pick the segments and build the single-pass ffmpeg command
 
-        subprocess.run(cmd, capture_output=True)
-        return output_file
+        The command writes into work_dir; the caller moves the file to
+        result['video_file'] once ffmpeg succeeds.
 
-    def add_audio_to_video(self, video_file, audio_file, output_file):
-        """Add audio track to video"""
-        cmd = [
-            'ffmpeg',
-            '-y',
-            '-i', video_file,
-            '-i', audio_file,
-            '-c:v', 'copy',
-            '-c:a', 'copy',
-            '-map', '0:v:0',
-            '-map', '1:a:0',
-            '-shortest',
-            output_file
-        ]
-
-        subprocess.run(cmd, capture_output=True)
-        return output_file
-
-    def assemble_video_with_visual_assets(self, audio_file, stock_clips, visual_assets=None, output_path='output/videos'):
-        """Assemble video mixing stock footage with visual assets (slides, images, graphics)"""
+        Returns:
+            tuple: (ffmpeg command, file it writes, result dict for the caller)
+        """
         logger.info('Assembling video with visual assets...')
 
         audio_duration = self.get_audio_duration(audio_file)
@@ -120,14 +241,19 @@ class VideoAssembler:
         avg_clip_duration = 5
         clips_needed = int(audio_duration / avg_clip_duration) + 1
 
-        prepared_clips = []
+        # Every segment becomes an input of one ffmpeg run: stock cuts are
+        # input-seeked (-ss/-t), images are looped, and a concat filter joins
+        # them, so the video is encoded exactly once with no temp files
+        inputs = []
+        segment_filters = []
+        segments_used = 0
         clip_index = 0
         visual_asset_index = 0
+        # stock clip -> (cut length, latest start); clips recur across segments
+        clip_windows = {}
 
         # Mix strategy: Every 3rd or 4th clip, use a visual asset instead of stock footage
         for i in range(clips_needed):
-            segment_file = os.path.join(self.temp_dir, f'segment_{i}.mp4')
-
             # Decide whether to use visual asset or stock footage
             use_visual_asset = (visual_assets and
                                len(visual_assets) > 0 and
@@ -140,74 +266,99 @@ class VideoAssembler:
                     asset = visual_assets[visual_asset_index]
                     logger.info(f'Using visual asset {visual_asset_index}: {asset["type"]}')
 
-                    # Convert image to video (show for 4-6 seconds)
+                    # Show the still image for 5 seconds; looping at the
+                    # output rate (the image demuxer defaults to 25 fps) makes
+                    # the fps filter a pass-through for stills
                     display_duration = 5
-                    self.image_to_video(asset['file'], display_duration, segment_file)
+                    inputs.extend([
+                        '-threads', str(SEGMENT_DECODE_THREADS),
+                        '-loop', '1', '-framerate', '30', '-t', str(display_duration), '-i', asset['file']
+                    ])
                     visual_asset_index += 1
                 else:
                     # Use stock video footage
                     stock_clip = stock_clips[clip_index % len(stock_clips)]
-                    clip_duration = self.get_video_duration(stock_clip)
-                    start_time = random.uniform(0, max(0, clip_duration - avg_clip_duration))
-
-                    self.create_video_segment(
-                        stock_clip,
-                        start_time,
-                        min(avg_clip_duration, clip_duration),
-                        segment_file
-                    )
+                    if stock_clip not in clip_windows:
+                        clip_duration = self.get_video_duration(stock_clip)
+                        clip_windows[stock_clip] = (
+                            min(avg_clip_duration, clip_duration),
+                            max(0, clip_duration - avg_clip_duration)
+                        )
+                    cut_length, latest_start = clip_windows[stock_clip]
+                    # Clips no longer than a cut always start at 0
+                    start_time = random.uniform(0, latest_start) if latest_start else 0
+
+                    inputs.extend([
+                        '-threads', str(SEGMENT_DECODE_THREADS),
+                        '-ss', str(start_time),
+                        '-t', str(cut_length),
+                        '-i', stock_clip
+                    ])
                     clip_index += 1
-
-                prepared_clips.append(segment_file)
             except Exception as e:
                 logger.warning(f'Error processing segment {i}: {e}')
                 continue
 
-        logger.info(f'Prepared {len(prepared_clips)} video segments (stock + visual assets)')
+            segment_filters.append(f'[{segments_used}:v]{SEGMENT_FILTER}[v{segments_used}]')
+            segments_used += 1
 
-        # Concatenate all clips
-        temp_video = os.path.join(self.temp_dir, 'temp_visual.mp4')
-        self.concatenate_clips(prepared_clips, temp_video)
+        if segments_used == 0:
+            raise RuntimeError('No usable video segments (stock clips or visual assets)')
 
-        # Trim to exact audio duration
-        trimmed_video = os.path.join(self.temp_dir, 'temp_trimmed.mp4')
-        trim_cmd = [
-            'ffmpeg', '-y',
-            '-i', temp_video,
-            '-t', str(audio_duration),
-            '-c:v', 'libx264',
-            '-b:v', '2M',
-            trimmed_video
-        ]
-        subprocess.run(trim_cmd, capture_output=True)
-        logger.info(f'Trimmed video to {audio_duration:.1f}s')
-
-        # Add audio
-        timestamp = datetime.now().strftime('%Y-%m-%d')
-        final_output = os.path.join(output_path, f'{timestamp}_final.mp4')
-        os.makedirs(output_path, exist_ok=True)
+        logger.info(f'Prepared {segments_used} video segments (stock + visual assets)')
 
-        self.add_audio_to_video(trimmed_video, audio_file, final_output)
+        concat_inputs = ''.join(f'[v{idx}]' for idx in range(segments_used))
+        overlay_inputs = []
+        if overlays:
+            # Overlay images follow the audio input
+            logger.info(f'Compositing {len(overlays)} text overlays in the same pass')
+            for overlay_data in overlays:
+                overlay_inputs.extend(['-i', overlay_data['file']])
+            segment_filters.append(f'{concat_inputs}concat=n={segments_used}:v=1:a=0[vcat]')
+            segment_filters.extend(
+                self._overlay_filters(overlays, segments_used + 1, '[vcat]', '[vout]')
+            )
+        else:
+            segment_filters.append(
+                f'{concat_inputs}concat=n={segments_used}:v=1:a=0'
+                f'{self.encoder_profile["filter_suffix"]}[vout]'
+            )
+        filter_complex = ';'.join(segment_filters)
 
-        logger.info(f'Video assembled: {final_output}')
+        # Named per run (time + the run's unique work directory), so two runs
+        # on the same day never replace each other's video
+        timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+        final_output = os.path.join(output_path, f'{timestamp}_{os.path.basename(work_dir)}_final.mp4')
+        work_output = os.path.join(work_dir, os.path.basename(final_output))
+        os.makedirs(output_path, exist_ok=True)
 
-        # Cleanup
-        for clip in prepared_clips:
-            try:
-                os.remove(clip)
-            except:
-                pass
+        # Audio is the last input; the video is cut to its exact duration
+        cmd = ['ffmpeg', '-y'] + self.encoder_profile['input_args'] + inputs + INPUT_QUEUE_ARGS + [
+            '-i', audio_file
+        ] + overlay_inputs + [
+            '-filter_complex', filter_complex,
+            '-filter_complex_threads', str(os.cpu_count() or 1),
+            '-map', '[vout]',
+            '-map', f'{segments_used}:a:0'
+        ] + self.codec_args + [
+            '-c:a', 'copy',
+            '-t', str(audio_duration),
+            '-shortest'
+        ] + FINAL_MOVFLAGS + [
+            work_output
+        ]
 
-        return {
+        return cmd, work_output, {
             'video_file': final_output,
             'duration': audio_duration,
-            'clips_used': len(prepared_clips),
-            'visual_assets_used': visual_asset_index
+            'clips_used': segments_used,
+            'visual_assets_used': visual_asset_index,
+            'overlays_used': len(overlays) if overlays else 0
         }
 
-    def assemble_video(self, audio_file, stock_clips, output_path='output/videos'):
+    def assemble_video(self, audio_file, stock_clips, output_path='output/videos', overlays=None):
         """Legacy method - calls enhanced version with no visual assets"""
-        return self.assemble_video_with_visual_assets(audio_file, stock_clips, None, output_path)
+        return self.assemble_video_with_visual_assets(audio_file, stock_clips, None, output_path, overlays)
 
     def add_text_overlays_to_video(self, video_file, overlays, output_file):
         """Add text overlay images to video at specific timestamps"""
@@ -218,40 +369,30 @@ class VideoAssembler:
         logger.info(f"Adding {len(overlays)} text overlays to video...")
 
         overlay_inputs = []
-        filter_complex_parts = []
-
-        for i, overlay_data in enumerate(overlays):
+        for overlay_data in overlays:
             overlay_inputs.extend(['-i', overlay_data['file']])
 
-            start_times = [120, 270, 330]
-            start_time = start_times[i] if i < len(start_times) else 180 + (i * 60)
-            end_time = start_time + overlay_data.get('duration', 8)
-
-            input_idx = i + 1
-            prev_label = '[0:v]' if i == 0 else f'[tmp{i}]'
-            curr_label = f'[tmp{i+1}]' if i < len(overlays) - 1 else '[out]'
-
-            filter_complex_parts.append(
-                f"{prev_label}[{input_idx}:v]overlay=0:0:enable='between(t,{start_time},{end_time})'{curr_label}"
-            )
-
-        filter_complex = ';'.join(filter_complex_parts)
+        filter_complex = ';'.join(self._overlay_filters(overlays, 1, '[0:v]', '[out]'))
 
         cmd = [
             'ffmpeg',
             '-y',
+            '-loglevel', 'error',
+            '-nostats'
+        ] + self.encoder_profile['input_args'] + [
             '-i', video_file
         ] + overlay_inputs + [
             '-filter_complex', filter_complex,
             '-map', '[out]',
-            '-map', '0:a',
-            '-c:v', 'libx264',
-            '-c:a', 'copy',
-            '-b:v', '2M',
+            '-map', '0:a'
+        ] + self.codec_args + [
+            '-c:a', 'copy'
+        ] + _movflags(output_file, FINAL_MOVFLAGS) + [
             output_file
         ]
 
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        # Only stderr is kept, and with -loglevel error it holds just the failure
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
 
         if result.returncode != 0:
             logger.error(f"FFmpeg overlay failed: {result.stderr}")
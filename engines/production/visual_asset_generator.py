@@ -4,15 +4,88 @@ Generates presentation slides, infographics, AI images, and stock images for vid
 """
 import os
 import sys
+import asyncio
+import functools
+import hashlib
+import threading
+import concurrent.futures
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from PIL import Image, ImageDraw, ImageFont
 import textwrap
-import requests
+import aiohttp
 from utils.logging_utils import setup_logger, get_daily_log_file
+from utils.async_utils import run_sync, write_chunks
 
 logger = setup_logger('visual_asset_gen', get_daily_log_file())
 
+BOLD_FONT_PATH = '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'
+REGULAR_FONT_PATH = '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+
+@functools.lru_cache(maxsize=32)
+def _get_font(bold, size):
+    """Load a TrueType font once per (weight, size), falling back to Pillow's default"""
+    try:
+        return ImageFont.truetype(BOLD_FONT_PATH if bold else REGULAR_FONT_PATH, size)
+    except OSError:
+        return ImageFont.load_default()
+
+@functools.lru_cache(maxsize=8)
+def _background_template(color, accent_bar=False):
+    """Blank 1920x1080 background (optionally with the bottom accent bar); callers draw on a copy"""
+    width, height = 1920, 1080
+    img = Image.new('RGB', (width, height), color=color)
+    if accent_bar:
+        ImageDraw.Draw(img).rectangle([100, height - 30, width - 100, height - 10], fill='#00d4ff')
+    return img
+
+# Cues are generated in parallel; images and downloads are mostly C code
+# (Pillow) or socket waits, which run outside the GIL
+ASSET_WORKERS = 8
+
+# Stock images are streamed to disk in chunks of this size
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Concurrent connections for a batch of stock image downloads
+STOCK_DOWNLOAD_CONCURRENCY = 8
+
+# A stock image already on disk is reused if it is at least this big
+# (smaller files are error pages or truncated downloads)
+MIN_STOCK_IMAGE_BYTES = 1024
+
+def _is_cached(path):
+    """Whether a previously downloaded stock image can be reused"""
+    try:
+        return os.path.getsize(path) > MIN_STOCK_IMAGE_BYTES
+    except OSError:
+        return False
+
+# Part of every rendered asset's file name; bump it when the slide/graphic
+# layout changes so cached renders from the old layout aren't reused
+ASSET_LAYOUT_VERSION = 1
+
+def _asset_key(*parts):
+    """
+    Stable file name stem for a rendered asset
+
+    Unlike hash(), which is salted per process, the same inputs give the
+    same name in every run, so an existing file can be reused.
+    """
+    key_text = '|'.join(map(str, (ASSET_LAYOUT_VERSION,) + parts))
+    return hashlib.blake2b(key_text.encode('utf-8'), digest_size=8).hexdigest()
+
+def _atomic_path(output_file):
+    """Per-thread temp path beside output_file (same extension, so Pillow picks the format)"""
+    root, ext = os.path.splitext(output_file)
+    return f'{root}.{os.getpid()}-{threading.get_ident()}.part{ext}'
+
+def _save_image(img, output_file):
+    """Save img via a temp file and rename, so cues sharing a file never interleave writes"""
+    part_file = _atomic_path(output_file)
+    # Pipeline intermediate (decoded again by ffmpeg): fastest deflate
+    img.save(part_file, 'PNG', optimize=False, compress_level=1)
+    os.replace(part_file, output_file)
+
 class VisualAssetGenerator:
     def __init__(self):
         self.output_dir = 'output/visual_assets'
@@ -24,20 +97,19 @@ class VisualAssetGenerator:
     def generate_presentation_slide(self, text, title="", output_file=None):
         """Generate a PowerPoint-style presentation slide"""
         if output_file is None:
-            output_file = os.path.join(f'{self.output_dir}/slides', f'slide_{hash(text) % 10000}.png')
+            output_file = os.path.join(f'{self.output_dir}/slides', f'slide_{_asset_key(text, title)}.png')
+            if os.path.exists(output_file):
+                return output_file
 
         # Create 1920x1080 image (HD video resolution)
+        # Dark blue background with the decorative bottom bar (text never
+        # reaches the bar, so it can be drawn first)
         width, height = 1920, 1080
-        img = Image.new('RGB', (width, height), color='#1a1a2e')  # Dark blue background
+        img = _background_template('#1a1a2e', accent_bar=True).copy()
         draw = ImageDraw.Draw(img)
 
-        # Try to load fonts, fallback to default
-        try:
-            title_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 80)
-            text_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 50)
-        except:
-            title_font = ImageFont.load_default()
-            text_font = ImageFont.load_default()
+        title_font = _get_font(True, 80)
+        text_font = _get_font(False, 50)
 
         # Draw title if provided
         y_offset = 100
@@ -57,28 +129,23 @@ class VisualAssetGenerator:
             draw.text(((width - text_width) // 2, y_offset), line, fill='#ffffff', font=text_font)
             y_offset += line_height
 
-        # Add decorative elements
-        draw.rectangle([100, height - 30, width - 100, height - 10], fill='#00d4ff')
-
-        img.save(output_file)
+        _save_image(img, output_file)
         logger.info(f'Created presentation slide: {output_file}')
         return output_file
 
     def generate_infographic(self, title, items, output_file=None):
         """Generate an infographic with title and bullet points"""
         if output_file is None:
-            output_file = os.path.join(f'{self.output_dir}/graphics', f'infographic_{hash(title) % 10000}.png')
+            output_file = os.path.join(f'{self.output_dir}/graphics', f'infographic_{_asset_key(title, items)}.png')
+            if os.path.exists(output_file):
+                return output_file
 
         width, height = 1920, 1080
-        img = Image.new('RGB', (width, height), color='#0f3460')  # Dark background
+        img = _background_template('#0f3460').copy()  # Dark background
         draw = ImageDraw.Draw(img)
 
-        try:
-            title_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 70)
-            item_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 45)
-        except:
-            title_font = ImageFont.load_default()
-            item_font = ImageFont.load_default()
+        title_font = _get_font(True, 70)
+        item_font = _get_font(False, 45)
 
         # Draw title
         y_offset = 80
@@ -101,27 +168,24 @@ class VisualAssetGenerator:
                 y_offset += 55
             y_offset += 20
 
-        img.save(output_file)
+        _save_image(img, output_file)
         logger.info(f'Created infographic: {output_file}')
         return output_file
 
     def generate_calculation_graphic(self, calculations, total, output_file=None):
         """Generate a savings calculation graphic"""
         if output_file is None:
-            output_file = os.path.join(f'{self.output_dir}/graphics', f'calculation_{hash(str(total)) % 10000}.png')
+            output_file = os.path.join(f'{self.output_dir}/graphics', f'calculation_{_asset_key(calculations, total)}.png')
+            if os.path.exists(output_file):
+                return output_file
 
         width, height = 1920, 1080
-        img = Image.new('RGB', (width, height), color='#1a1a2e')
+        img = _background_template('#1a1a2e').copy()
         draw = ImageDraw.Draw(img)
 
-        try:
-            title_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 80)
-            calc_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 55)
-            total_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 90)
-        except:
-            title_font = ImageFont.load_default()
-            calc_font = ImageFont.load_default()
-            total_font = ImageFont.load_default()
+        title_font = _get_font(True, 80)
+        calc_font = _get_font(False, 55)
+        total_font = _get_font(True, 90)
 
         # Draw title
         title = "TOTAL SAVINGS"
@@ -149,85 +213,176 @@ class VisualAssetGenerator:
         draw.rectangle([total_x - 40, total_y - 20, total_x + total_width + 40, total_y + 100], fill='#16c79a')
         draw.text((total_x, total_y), total_text, fill='#1a1a2e', font=total_font)
 
-        img.save(output_file)
+        _save_image(img, output_file)
         logger.info(f'Created calculation graphic: {output_file}')
         return output_file
 
+    def _stock_image_path(self, search_term):
+        """Default file for a search term's stock image"""
+        return os.path.join(f'{self.output_dir}/stock_images', f'{search_term.replace(" ", "_")}.jpg')
+
+    def _stock_image_url(self, search_term):
+        """Use Unsplash Source API (free, no API key needed)"""
+        return f"https://source.unsplash.com/1920x1080/?{search_term}"
+
     def download_stock_image(self, search_term, output_file=None):
         """Download a free stock image from Unsplash or Pexels"""
         if output_file is None:
-            output_file = os.path.join(f'{self.output_dir}/stock_images', f'{search_term.replace(" ", "_")}.jpg')
+            output_file = self._stock_image_path(search_term)
+
+        # The file name is derived from the search term, so a previous
+        # download for the same term is reused without a request
+        if _is_cached(output_file):
+            logger.info(f'Using cached stock image for "{search_term}": {output_file}')
+            return output_file
+
+        # Same aiohttp client as the batch downloads, as a batch of one
+        return run_sync(self._download_stock_images([(search_term, output_file)]))[0]
 
-        # Use Unsplash Source API (free, no API key needed)
-        url = f"https://source.unsplash.com/1920x1080/?{search_term}"
+    async def _fetch_stock_image(self, session, search_term, output_file):
+        """Stream one stock image to disk, returning its path or None on failure"""
+        partial_path = _atomic_path(output_file)
 
         try:
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                with open(output_file, 'wb') as f:
-                    f.write(response.content)
-                logger.info(f'Downloaded stock image for "{search_term}": {output_file}')
-                return output_file
-            else:
-                logger.warning(f'Failed to download stock image for "{search_term}"')
-                return None
+            async with session.get(self._stock_image_url(search_term)) as response:
+                if response.status != 200:
+                    logger.warning(f'Failed to download stock image for "{search_term}"')
+                    return None
+                await write_chunks(response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE), partial_path)
+            os.replace(partial_path, output_file)
+            logger.info(f'Downloaded stock image for "{search_term}": {output_file}')
+            return output_file
+
         except Exception as e:
             logger.error(f'Error downloading stock image: {e}')
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
             return None
 
+    async def _download_stock_images(self, downloads):
+        """Download (search term, output file) pairs concurrently over one session"""
+        connector = aiohttp.TCPConnector(limit=STOCK_DOWNLOAD_CONCURRENCY, keepalive_timeout=30)
+        timeout = aiohttp.ClientTimeout(total=30, sock_connect=3.05)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            return await asyncio.gather(
+                *[self._fetch_stock_image(session, term, output_file)
+                  for term, output_file in downloads]
+            )
+
+    def download_stock_images(self, search_terms):
+        """
+        Download stock images for several search terms concurrently
+
+        Args:
+            search_terms: Search terms (duplicates are fetched once)
+
+        Returns:
+            dict: search term -> downloaded file, or None if it failed
+        """
+        unique_terms = list(dict.fromkeys(search_terms))
+        files = {
+            term: self._stock_image_path(term)
+            for term in unique_terms if _is_cached(self._stock_image_path(term))
+        }
+        if files:
+            logger.info(f'Using {len(files)} cached stock images')
+
+        missing = [term for term in unique_terms if term not in files]
+        if missing:
+            downloads = [(term, self._stock_image_path(term)) for term in missing]
+            files.update(zip(missing, run_sync(self._download_stock_images(downloads))))
+        return files
+
     def generate_assets_from_visual_cues(self, visual_cues, script_content):
         """Generate all visual assets based on visual cues from script"""
         logger.info(f'Generating {len(visual_cues)} visual assets...')
 
-        assets = []
+        # Stock images are pure network I/O: they are fetched concurrently on
+        # an event loop while the slides and graphics render on the thread pool
+        stock_terms = {
+            position: self._extract_search_term(cue['description'])
+            for position, cue in enumerate(visual_cues) if cue['type'] == 'stock_image'
+        }
+        render_cues = [
+            (position, cue) for position, cue in enumerate(visual_cues) if position not in stock_terms
+        ]
+
+        results = [None] * len(visual_cues)
+        workers = max(1, min(ASSET_WORKERS, len(render_cues)))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                position: executor.submit(self._generate_one, cue, script_content)
+                for position, cue in render_cues
+            }
+            try:
+                stock_files = self.download_stock_images(stock_terms.values())
+            except Exception as e:
+                logger.error(f'Error downloading stock images: {e}')
+                stock_files = {}
 
-        for cue in visual_cues:
-            cue_type = cue['type']
-            description = cue['description']
+            for position, term in stock_terms.items():
+                if stock_files.get(term):
+                    results[position] = {
+                        'type': 'stock_image', 'file': stock_files[term],
+                        'description': visual_cues[position]['description']
+                    }
+            for position, future in futures.items():
+                results[position] = future.result()
 
-            try:
-                if cue_type == 'presentation_slide':
-                    # Extract prompt text from script if it's a prompt slide
-                    if 'prompt' in description.lower():
-                        # Look for nearby prompt in script
-                        prompt_match = self._find_nearby_prompt(script_content, cue['index'])
-                        if prompt_match:
-                            asset_file = self.generate_presentation_slide(prompt_match, title="ChatGPT Prompt")
-                            assets.append({'type': 'slide', 'file': asset_file, 'description': description})
-                    else:
-                        asset_file = self.generate_presentation_slide(description)
-                        assets.append({'type': 'slide', 'file': asset_file, 'description': description})
-
-                elif cue_type == 'infographic':
-                    # Generate generic infographic
-                    items = ["Tip 1: Track your expenses", "Tip 2: Cancel unused subscriptions", "Tip 3: Review monthly"]
-                    asset_file = self.generate_infographic(description, items)
-                    assets.append({'type': 'infographic', 'file': asset_file, 'description': description})
-
-                elif cue_type == 'calculation_graphic':
-                    # Generate calculation graphic
-                    calcs = [("Netflix", 8), ("Starbucks", 120), ("Uber Eats", 95)]
-                    asset_file = self.generate_calculation_graphic(calcs, 223)
-                    assets.append({'type': 'calculation', 'file': asset_file, 'description': description})
-
-                elif cue_type == 'stock_image':
-                    # Download relevant stock image
-                    search_term = self._extract_search_term(description)
-                    asset_file = self.download_stock_image(search_term)
-                    if asset_file:
-                        assets.append({'type': 'stock_image', 'file': asset_file, 'description': description})
+        # Results are slotted by cue position, so assets keep script order
+        assets = [asset for asset in results if asset is not None]
+
+        logger.info(f'Generated {len(assets)} visual assets successfully')
+        return assets
+
+    def _generate_one(self, cue, script_content):
+        """
+        Generate the asset for one rendered (non stock image) visual cue
 
+        Args:
+            cue: Visual cue dict with 'type', 'description' and 'index'
+            script_content: Full script text (for prompt slides)
+
+        Returns:
+            dict: Asset info (type, file, description), or None if nothing was made
+        """
+        cue_type = cue['type']
+        description = cue['description']
+
+        try:
+            if cue_type == 'presentation_slide':
+                # Extract prompt text from script if it's a prompt slide
+                if 'prompt' in description.lower():
+                    # Look for nearby prompt in script
+                    prompt_match = self._find_nearby_prompt(script_content, cue['index'])
+                    if prompt_match:
+                        asset_file = self.generate_presentation_slide(prompt_match, title="ChatGPT Prompt")
+                        return {'type': 'slide', 'file': asset_file, 'description': description}
                 else:
-                    # Default: create a simple slide
                     asset_file = self.generate_presentation_slide(description)
-                    assets.append({'type': 'slide', 'file': asset_file, 'description': description})
+                    return {'type': 'slide', 'file': asset_file, 'description': description}
 
-            except Exception as e:
-                logger.error(f'Error generating asset for "{description}": {e}')
-                continue
+            elif cue_type == 'infographic':
+                # Generate generic infographic
+                items = ["Tip 1: Track your expenses", "Tip 2: Cancel unused subscriptions", "Tip 3: Review monthly"]
+                asset_file = self.generate_infographic(description, items)
+                return {'type': 'infographic', 'file': asset_file, 'description': description}
 
-        logger.info(f'Generated {len(assets)} visual assets successfully')
-        return assets
+            elif cue_type == 'calculation_graphic':
+                # Generate calculation graphic
+                calcs = [("Netflix", 8), ("Starbucks", 120), ("Uber Eats", 95)]
+                asset_file = self.generate_calculation_graphic(calcs, 223)
+                return {'type': 'calculation', 'file': asset_file, 'description': description}
+
+            else:
+                # Default: create a simple slide
+                asset_file = self.generate_presentation_slide(description)
+                return {'type': 'slide', 'file': asset_file, 'description': description}
+
+        except Exception as e:
+            logger.error(f'Error generating asset for "{description}": {e}')
+
+        return None
 
     def _find_nearby_prompt(self, script, cue_index):
         """Find ChatGPT prompt near a visual cue"""
@@ -96,7 +96,7 @@ async def generate_and_upload_first_video():
     # Step 5: Generate DYNAMIC synchronized voiceover
     logger.info("Step 5/8: Generating DYNAMIC synchronized voiceover narration...")
     narrator = ScriptureNarrator()
-    narration_file = os.path.join(output_dir, "narration.mp3")
+    narration_file = os.path.join(output_dir, "narration.wav")
 
     narration_result = await narrator.generate_scripture_narration_dynamic(
         scriptures=scriptures,
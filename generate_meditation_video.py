@@ -54,7 +54,7 @@ def generate_meditation_video(theme='peace and rest', duration=60, verse_count=3
     # Step 3: Get music
     logger.info('\n3. Getting peaceful music...')
     music_mgr = MusicManager()
-    music_file = music_mgr.get_peaceful_music(duration=duration, theme=theme)
+    music_file = music_mgr.get_peaceful_music(duration=duration, theme=theme, aac=True)
 
     if not music_file:
         logger.warning('   ⚠️  No music available - video will be silent')
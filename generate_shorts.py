@@ -76,7 +76,7 @@ async def generate_shorts_video(event, emotion, content_type, score=0):
     # Step 2: Generate dynamic voiceover
     logger.info("Step 2/7: Generating voiceover narration...")
     narrator = ScriptureNarrator()
-    narration_file = os.path.join(output_dir, "narration.mp3")
+    narration_file = os.path.join(output_dir, "narration.wav")
 
     narration_result = await narrator.generate_scripture_narration_dynamic(
         scriptures=scriptures,
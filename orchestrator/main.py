@@ -127,22 +127,18 @@ class SmartMoneyOrchestrator:
             logger.info(f'Stock footage downloaded: {len(stock_clips)} clips')
             
             # Assemble video
-            # Assemble video with mixed visual assets
+            # Assemble video with mixed visual assets; text overlays are
+            # composited in the same encode
             if len(visual_assets) > 0:
                 video_result = self.video_assembler.assemble_video_with_visual_assets(
-                    audio_file, stock_clips, visual_assets
+                    audio_file, stock_clips, visual_assets, overlays=overlays
                 )
                 logger.info(f'Used {video_result.get("visual_assets_used", 0)} visual assets in video')
             else:
-                video_result = self.video_assembler.assemble_video(audio_file, stock_clips)
+                video_result = self.video_assembler.assemble_video(audio_file, stock_clips, overlays=overlays)
             video_file = video_result['video_file']
             
-            # Add text overlays to video
-            if overlays and len(overlays) > 0:
-                video_with_overlays = video_file.replace('_final.mp4', '_with_overlays.mp4')
-                video_file = self.video_assembler.add_text_overlays_to_video(
-                    video_file, overlays, video_with_overlays
-                )
+            if video_result.get('overlays_used'):
                 logger.info(f'Text overlays composited onto video')
 
             logger.info(f'Video assembled: {video_file}')
@@ -0,0 +1,52 @@
+"""
+Smoke test for the long-form pipeline: every engine call is checked against
+the real signatures, with the engines themselves stubbed out
+"""
+import asyncio
+import os
+import sys
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engines.production import long_form_generator
+from engines.production.long_form_generator import LongFormGenerator
+
+SCRIPTURES = [
+    {'verse': 'Be still, and know that I am God', 'reference': 'Psalm 46:10'},
+    {'verse': 'The Lord is my shepherd; I shall not want', 'reference': 'Psalm 23:1'},
+]
+
+def test_generate_8hour_video_reaches_assembly(tmp_path, monkeypatch):
+    output_dir = str(tmp_path / 'longform')
+    assembled = tmp_path / 'assembled.mp4'
+
+    def assemble(nature_videos, scriptures, music_file, duration=300, verse_timings=None, resolution='1920x1080'):
+        assembled.write_bytes(b'video')
+        return str(assembled)
+
+    # autospec makes every stub reject arguments the real method would reject
+    for name in ['ScriptureCurator', 'ScriptureNarrator', 'NatureAssetManager',
+                 'MusicManager', 'MeditationVideoAssembler', 'run_ffmpeg']:
+        monkeypatch.setattr(long_form_generator, name,
+                            mock.create_autospec(getattr(long_form_generator, name)))
+    long_form_generator.ScriptureCurator.return_value.curate_scriptures_for_event.return_value = SCRIPTURES
+    long_form_generator.NatureAssetManager.return_value.fetch_nature_videos.return_value = ['nature.mp4']
+    long_form_generator.MusicManager.return_value.get_peaceful_music.return_value = 'music.mp3'
+    assembler = long_form_generator.MeditationVideoAssembler.return_value
+    assembler.assemble_meditation_video.side_effect = assemble
+
+    generator = LongFormGenerator()
+    generator.duration_8hr = 60
+    generator.verses_needed = len(SCRIPTURES)
+    metadata = asyncio.run(generator.generate_8hour_video(
+        event='AI Joblessness', emotion='Anxiety', output_dir=output_dir
+    ))
+
+    mixed_audio = os.path.join(output_dir, 'mixed_audio.mp3')
+    assembler.assemble_meditation_video.assert_called_once_with(
+        ['nature.mp4'], SCRIPTURES, mixed_audio, duration=60
+    )
+    assert metadata['video_file'] == os.path.join(output_dir, 'AI_Joblessness_Anxiety_8hr.mp4')
+    assert os.path.exists(metadata['video_file'])
+    assert not assembled.exists()
@@ -0,0 +1,71 @@
+"""
+Tests for the topic scorer: the single and batch scoring paths must agree
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engines.opportunity.topic_scorer import TopicScorer
+
+# (keyword, trend_data, keyword_data, expected total, expected factors)
+CASES = [
+    ('rising low competition', {'velocity_pct': 150, 'current_interest': 80}, {'competition': 'low'},
+     95, {'trend_velocity': 30, 'search_interest': 25, 'competition': 25, 'recency': 15}),
+    ('steady medium competition', {'velocity_pct': 60, 'current_interest': 30}, {'competition': 'medium'},
+     65, {'trend_velocity': 20, 'search_interest': 15, 'competition': 15, 'recency': 15}),
+    ('falling high competition', {'velocity_pct': -5, 'current_interest': 10}, {'competition': 'high'},
+     35, {'trend_velocity': 5, 'search_interest': 10, 'competition': 5, 'recency': 15}),
+    ('thresholds are exclusive', {'velocity_pct': 100, 'current_interest': 75}, None,
+     55, {'trend_velocity': 20, 'search_interest': 20, 'recency': 15}),
+    ('just over a threshold', {'velocity_pct': 100.0000001, 'current_interest': 50.5}, {},
+     65, {'trend_velocity': 30, 'search_interest': 20, 'recency': 15}),
+    ('unknown competition', None, {'competition': 'unknown'},
+     25, {'competition': 10, 'recency': 15}),
+    ('reddit post', {'score': 120}, {},
+     15, {'recency': 15}),
+]
+
+@pytest.fixture
+def scorer():
+    # Scoring uses neither API client, so skip __init__ and its setup
+    return TopicScorer.__new__(TopicScorer)
+
+@pytest.mark.parametrize('keyword, trend_data, keyword_data, total, factors', CASES)
+def test_score_opportunity(scorer, keyword, trend_data, keyword_data, total, factors):
+    result = scorer.score_opportunity(keyword, trend_data, keyword_data)
+
+    assert result == {'keyword': keyword, 'total_score': total, 'factors': factors}
+
+def test_score_opportunities_matches_score_opportunity(scorer):
+    keywords = [
+        {'keyword': keyword, 'source': 'test', 'trend_data': trend_data}
+        for keyword, trend_data, _, _, _ in CASES
+    ]
+    keyword_datas = [keyword_data for _, _, keyword_data, _, _ in CASES]
+
+    batch = {result['keyword']: result for result in scorer.score_opportunities(keywords, keyword_datas)}
+
+    assert len(batch) == len(CASES)
+    for keyword, trend_data, keyword_data, _, _ in CASES:
+        single = scorer.score_opportunity(keyword, trend_data, keyword_data)
+        assert batch[keyword]['total_score'] == single['total_score']
+        assert batch[keyword]['factors'] == single['factors']
+        assert batch[keyword]['keyword_data'] == keyword_data
+
+def test_score_opportunities_sorted_best_first(scorer):
+    keywords = [
+        {'keyword': 'a', 'source': 'test', 'trend_data': {'velocity_pct': 10}},
+        {'keyword': 'b', 'source': 'test', 'trend_data': {'velocity_pct': 200}},
+        {'keyword': 'c', 'source': 'test', 'trend_data': {'velocity_pct': 10}},
+    ]
+
+    results = scorer.score_opportunities(keywords, [{}, {}, {}])
+
+    # Ties keep discovery order
+    assert [result['keyword'] for result in results] == ['b', 'a', 'c']
+
+def test_score_opportunities_empty(scorer):
+    assert scorer.score_opportunities([], []) == []
@@ -0,0 +1,69 @@
+"""
+Helpers for calling async engine code from synchronous wrappers
+"""
+import asyncio
+import threading
+
+_local = threading.local()
+_background_loop = None
+_background_lock = threading.Lock()
+
+def _thread_loop():
+    """This thread's reusable event loop, created on first use"""
+    loop = getattr(_local, 'loop', None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _local.loop = loop
+    return loop
+
+def _get_background_loop():
+    """Event loop running forever in a daemon thread, created on first use"""
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_background_loop.run_forever, name='async-utils-loop', daemon=True
+            ).start()
+    return _background_loop
+
+def run_sync(coro):
+    """
+    Run a coroutine to completion from synchronous code
+
+    Unlike asyncio.run, the event loop is kept and reused by later calls
+    from the same thread, so repeated sync wrappers don't each pay for loop
+    setup and teardown. If the calling thread is already running a loop
+    (a sync wrapper called from async code), the coroutine is run on a
+    shared background loop instead and this call blocks until it is done.
+
+    Args:
+        coro: Coroutine to run
+
+    Returns:
+        The coroutine's result
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return _thread_loop().run_until_complete(coro)
+    return asyncio.run_coroutine_threadsafe(coro, _get_background_loop()).result()
+
+async def write_chunks(chunks, path):
+    """
+    Write an async stream of byte chunks to a file without blocking the loop
+
+    Opening, writing and closing run in the loop's default executor, so a
+    slow disk never stalls the other downloads sharing the event loop.
+
+    Args:
+        chunks: Async iterable of bytes (e.g. response.content.iter_chunked(n))
+        path: File to create or overwrite
+    """
+    loop = asyncio.get_running_loop()
+    f = await loop.run_in_executor(None, open, path, 'wb')
+    try:
+        async for chunk in chunks:
+            await loop.run_in_executor(None, f.write, chunk)
+    finally:
+        await loop.run_in_executor(None, f.close)
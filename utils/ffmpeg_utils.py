@@ -0,0 +1,204 @@
+"""
+ffmpeg helpers shared by the production engines
+"""
+import asyncio
+import functools
+import shutil
+import subprocess
+import tempfile
+import time
+
+@functools.lru_cache(maxsize=None)
+def resolve_executable(program):
+    """
+    Absolute path of program on PATH (program itself if it isn't found)
+
+    subprocess only takes its posix_spawn fast path (instead of fork+exec)
+    when the executable has a directory component and close_fds=False;
+    Python opens its own fds non-inheritable, so close_fds=False leaks nothing.
+    """
+    return shutil.which(program) or program
+
+# H.264 encoders in order of preference. input_args go before the first -i,
+# decode_args go before an input that should be hardware-decoded (decoded
+# frames are downloaded for CPU filters and ffmpeg falls back to software
+# decoding for codecs the GPU can't handle), filter_suffix is appended to the
+# video filter chain (VAAPI needs frames uploaded to the GPU), codec_args
+# select the encoder at a constant quality (callers targeting a bitrate
+# substitute their own rate control).
+H264_ENCODER_PROFILES = {
+    'h264_nvenc': {
+        'input_args': [],
+        'decode_args': ['-hwaccel', 'cuda'],
+        'filter_suffix': '',
+        'codec_args': ['-c:v', 'h264_nvenc', '-preset', 'p4', '-rc', 'vbr', '-cq', '23', '-b:v', '0'],
+    },
+    'h264_qsv': {
+        'input_args': [],
+        'decode_args': [],
+        'filter_suffix': ',format=nv12',
+        'codec_args': ['-c:v', 'h264_qsv', '-preset', 'medium', '-global_quality', '23'],
+    },
+    'h264_vaapi': {
+        'input_args': ['-vaapi_device', '/dev/dri/renderD128'],
+        'decode_args': ['-hwaccel', 'vaapi'],
+        'filter_suffix': ',format=nv12,hwupload',
+        'codec_args': ['-c:v', 'h264_vaapi', '-qp', '23'],
+    },
+    'libx264': {
+        'input_args': [],
+        'decode_args': [],
+        'filter_suffix': '',
+        'codec_args': ['-c:v', 'libx264', '-crf', '20'],  # callers add their own -preset
+    },
+}
+
+@functools.lru_cache(maxsize=None)
+def select_h264_encoder(forced=None):
+    """
+    Pick the fastest working H.264 encoder (probed once per process)
+
+    An encoder being compiled in does not mean the GPU is present, so each
+    candidate is confirmed with a tiny test encode before it is chosen.
+
+    Args:
+        forced: Profile name to use without probing (ignored if unknown)
+
+    Returns:
+        str: A key of H264_ENCODER_PROFILES
+    """
+    if forced in H264_ENCODER_PROFILES:
+        return forced
+
+    try:
+        result = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'], capture_output=True, text=True)
+    except OSError:
+        return 'libx264'
+    available = {
+        parts[1] for parts in (line.split() for line in result.stdout.splitlines())
+        if len(parts) >= 2
+    }
+
+    for name in ('h264_nvenc', 'h264_qsv', 'h264_vaapi'):
+        if name not in available:
+            continue
+        profile = H264_ENCODER_PROFILES[name]
+        test_cmd = (
+            ['ffmpeg', '-hide_banner', '-v', 'error']
+            + profile['input_args']
+            + ['-f', 'lavfi', '-i', 'color=c=black:s=256x256:d=0.2',
+               '-vf', 'null' + profile['filter_suffix']]
+            + profile['codec_args']
+            + ['-f', 'null', '-']
+        )
+        if subprocess.run(test_cmd, capture_output=True).returncode == 0:
+            return name
+
+    return 'libx264'
+
+def _progress_args(cmd):
+    """cmd with progress reporting on stdout and stderr limited to errors"""
+    # -progress/-nostats/-loglevel are global options: they go before the inputs
+    return [resolve_executable(cmd[0]), '-progress', 'pipe:1', '-nostats', '-loglevel', 'error'] + list(cmd[1:])
+
+class _ProgressLogger:
+    """Turns ffmpeg -progress lines into rate-limited log messages"""
+
+    def __init__(self, duration, logger, log_interval):
+        self.duration = duration
+        self.logger = logger
+        self.log_interval = log_interval
+        self.next_log = time.monotonic() + log_interval
+
+    def feed(self, line):
+        # out_time_ms is reported in microseconds despite its name
+        key, _, value = line.strip().partition('=')
+        if key != 'out_time_ms' or not value.isdigit():
+            return
+        now = time.monotonic()
+        if self.logger and now >= self.next_log:
+            seconds = int(value) / 1e6
+            if self.duration:
+                self.logger.info(
+                    f'ffmpeg progress: {seconds:.1f}s / {self.duration}s '
+                    f'({seconds / self.duration * 100:.1f}%)'
+                )
+            else:
+                self.logger.info(f'ffmpeg progress: {seconds:.1f}s')
+            self.next_log = now + self.log_interval
+
+def _check_returncode(returncode, cmd, stderr_file):
+    """Raise CalledProcessError with ffmpeg's error output if it failed"""
+    if returncode != 0:
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode('utf-8', errors='replace')
+        raise subprocess.CalledProcessError(returncode, cmd, stderr=stderr)
+
+def run_ffmpeg(cmd, duration=None, logger=None, log_interval=30):
+    """
+    Run an ffmpeg command, streaming progress instead of buffering output
+
+    ffmpeg's progress reports (-progress pipe:1) are read line by line and
+    logged at most every log_interval seconds; stderr is limited to errors
+    and spooled to a temp file, so multi-hour encodes stay at constant memory.
+
+    Args:
+        cmd: ffmpeg argument list, starting with 'ffmpeg'
+        duration: Expected output duration in seconds (for percentages)
+        logger: Logger for progress lines (optional)
+        log_interval: Minimum seconds between progress log lines
+
+    Returns:
+        int: ffmpeg's exit code (always 0)
+
+    Raises:
+        subprocess.CalledProcessError: If ffmpeg exits non-zero
+    """
+    full_cmd = _progress_args(cmd)
+    progress = _ProgressLogger(duration, logger, log_interval)
+
+    with tempfile.TemporaryFile() as stderr_file:
+        proc = subprocess.Popen(
+            full_cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+            stderr=stderr_file, text=True, close_fds=False
+        )
+        for line in proc.stdout:
+            progress.feed(line)
+        returncode = proc.wait()
+        _check_returncode(returncode, full_cmd, stderr_file)
+
+    return returncode
+
+async def run_ffmpeg_async(cmd, duration=None, logger=None, log_interval=30):
+    """
+    Async variant of run_ffmpeg for use inside an event loop
+
+    The event loop stays free while ffmpeg runs, so several encodes can be
+    awaited concurrently (e.g. with asyncio.gather).
+
+    Args:
+        cmd: ffmpeg argument list, starting with 'ffmpeg'
+        duration: Expected output duration in seconds (for percentages)
+        logger: Logger for progress lines (optional)
+        log_interval: Minimum seconds between progress log lines
+
+    Returns:
+        int: ffmpeg's exit code (always 0)
+
+    Raises:
+        subprocess.CalledProcessError: If ffmpeg exits non-zero
+    """
+    full_cmd = _progress_args(cmd)
+    progress = _ProgressLogger(duration, logger, log_interval)
+
+    with tempfile.TemporaryFile() as stderr_file:
+        proc = await asyncio.create_subprocess_exec(
+            *full_cmd, stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE, stderr=stderr_file, close_fds=False
+        )
+        async for line in proc.stdout:
+            progress.feed(line.decode('utf-8', errors='replace'))
+        returncode = await proc.wait()
+        _check_returncode(returncode, full_cmd, stderr_file)
+
+    return returncode
@@ -0,0 +1,40 @@
+"""
+Pixel-width text wrapping for Pillow-rendered images
+"""
+
+def wrap_text(text, font, max_width):
+    """
+    Greedily wrap text into lines no wider than max_width pixels
+
+    Each word is measured once with font.getlength (horizontal advances
+    only, no glyph rasterizing); line widths are running sums of those
+    advances. A word wider than max_width gets a line of its own.
+
+    Args:
+        text: Text to wrap (a single paragraph; newlines are treated as spaces)
+        font: Pillow font providing getlength
+        max_width: Maximum line width in pixels
+
+    Returns:
+        list: Wrapped lines
+    """
+    space_width = font.getlength(' ')
+    lines = []
+    current_line = []
+    current_width = 0
+
+    for word in text.split():
+        word_width = font.getlength(word)
+        if current_line and current_width + space_width + word_width > max_width:
+            lines.append(' '.join(current_line))
+            current_line = []
+            current_width = 0
+        if current_line:
+            current_width += space_width
+        current_line.append(word)
+        current_width += word_width
+
+    if current_line:
+        lines.append(' '.join(current_line))
+
+    return lines
@@ -42,7 +42,7 @@ class YouTubeAPI:
         return response
     
     def get_video_stats(self, video_id):
-        """Get video statistics"""
+        """Get video statistics (video_id may be a comma-separated list)"""
         if not self.youtube:
             self.authenticate()
         
@@ -67,3 +67,28 @@ class YouTubeAPI:
         )
         response = request.execute()
         return response
+    
+    def get_channel_stats(self, channel_id):
+        """Get channel statistics and uploads playlist (1 quota unit)"""
+        if not self.youtube:
+            self.authenticate()
+        
+        request = self.youtube.channels().list(
+            part='statistics,contentDetails',
+            id=channel_id
+        )
+        response = request.execute()
+        return response
+    
+    def get_playlist_items(self, playlist_id, max_results=5):
+        """Get latest items from a playlist (1 quota unit)"""
+        if not self.youtube:
+            self.authenticate()
+        
+        request = self.youtube.playlistItems().list(
+            playlistId=playlist_id,
+            part='snippet,contentDetails',
+            maxResults=max_results
+        )
+        response = request.execute()
+        return response